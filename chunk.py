@@ -0,0 +1,40 @@
+"""Document chunk type shared by the PDF processor and the vector store."""
+
+from dataclasses import dataclass
+from typing import Any, Mapping
+
+
+@dataclass
+class Chunk:
+    """A piece of page text with its source metadata.
+
+    Slotted to keep large chunk lists compact; declared by hand rather
+    than with dataclass(slots=True) to stay compatible with Python 3.8.
+    """
+
+    __slots__ = ("text", "tokens", "page_number", "filename", "filepath")
+
+    text: str
+    tokens: int
+    page_number: int
+    filename: str
+    filepath: str
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "Chunk":
+        """Create a chunk from the dictionary form chunks used to have.
+
+        Args:
+            data: Mapping with text, page_number, filename and filepath
+                keys, and optionally tokens.
+
+        Returns:
+            The equivalent chunk.
+        """
+        return cls(
+            text=data["text"],
+            tokens=data.get("tokens", 0),
+            page_number=data["page_number"],
+            filename=data["filename"],
+            filepath=data["filepath"]
+        )
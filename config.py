@@ -7,17 +7,30 @@ from pathlib import Path
 APP_NAME = "pdf-chat-ollama"
 DATA_DIR = Path.home() / f".{APP_NAME}"
 VECTOR_DB_PATH = DATA_DIR / "chroma_db"
-HISTORY_DB_PATH = DATA_DIR / "chat_history.json"
+HISTORY_DB_PATH = DATA_DIR / "chat_history.json"  # legacy single-file history
+SESSIONS_DIR = DATA_DIR / "sessions"
+HISTORY_INDEX_PATH = SESSIONS_DIR / "index.json"
+CHUNK_CACHE_DIR = DATA_DIR / "chunk_cache"
 
 # Ollama settings
 OLLAMA_BASE_URL = "http://localhost:11434"
 CHAT_MODEL = "mixtral"
 EMBEDDING_MODEL = "nomic-embed-text"
+EMBED_KEEP_ALIVE = "30m"  # how long Ollama keeps the embedding model loaded
+EMBED_NUM_BATCH = 512  # tokens Ollama processes per forward pass when embedding
+OLLAMA_POOL_SIZE = 16  # keep-alive connections reused across requests
 
 # Text processing settings
 CHUNK_SIZE = 1000  # tokens
 CHUNK_OVERLAP = 128  # tokens
 MAX_CONTEXT_CHUNKS = 5
+EMBED_BATCH_SIZE = 32  # chunks embedded per request
+EMBED_CONCURRENCY = 4  # embedding requests in flight during ingestion
+
+# Query cache settings
+QUERY_CACHE_SIZE = 256  # cached queries
+QUERY_CACHE_THRESHOLD = 0.95  # cosine similarity needed to reuse results
+HISTORY_WRITE_WINDOW = 0.05  # seconds to coalesce queued history writes
 
 # Chat settings
 SYSTEM_PROMPT = """You are a helpful assistant that answers questions based on the provided PDF documents. 
@@ -25,5 +38,12 @@ Always cite your sources by mentioning the document name and page number when po
 If you cannot find relevant information in the provided context, say so clearly.
 Be concise but thorough in your responses."""
 
-# Ensure data directory exists
-DATA_DIR.mkdir(exist_ok=True)
+
+def ensure_data_dir() -> Path:
+    """Create the data directory if it does not exist yet.
+
+    Returns:
+        Path to the data directory.
+    """
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    return DATA_DIR
@@ -1,17 +1,23 @@
 """Main CLI interface for PDF Chat with Ollama."""
 
 import logging
+import multiprocessing
+import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 from typing import List, Optional
 
 import click
+import ollama
 from rich.console import Console
 from rich.panel import Panel
 from rich.progress import Progress, SpinnerColumn, TextColumn
 from rich.table import Table
 
-from pdf_chat_ollama import APP_NAME, ChatEngine, HistoryManager, PDFProcessor, VectorStore
+from pdf_chat_ollama import APP_NAME, ChatEngine, HistoryManager, VectorStore
+from pdf_chat_ollama.pdf_processor import process_pdf_path
 
 # Configure logging
 logging.basicConfig(
@@ -22,6 +28,12 @@ logger = logging.getLogger(__name__)
 
 console = Console()
 
+# How long a successful Ollama connection check is trusted, in seconds
+OLLAMA_CHECK_TTL = 30.0
+
+# Inputs that leave the chat session or the application
+_EXIT_WORDS = frozenset({"exit", "quit", "q"})
+
 
 class PDFChatCLI:
     """Main CLI application for PDF Chat."""
@@ -29,20 +41,37 @@ class PDFChatCLI:
     def __init__(self) -> None:
         """Initialize the CLI application."""
         self.console = console
-        self.pdf_processor = PDFProcessor()
         self.vector_store = VectorStore()
         self.history_manager = HistoryManager()
         self.chat_engine = ChatEngine(self.vector_store, self.history_manager)
+        self._ollama_ok_until = 0.0
+
+        # Interactive commands: name -> (handler, arity), where an arity
+        # of -1 passes all arguments as a list
+        self._commands = {
+            'help': (self._display_help, 0),
+            'upload': (self.upload_pdfs, -1),
+            'chat': (self.start_chat, 0),
+            'sessions': (self.list_sessions, 0),
+            'load': (self.load_session, 1),
+            'stats': (self.show_stats, 0),
+            'clear': (self.clear_data, 0),
+        }
 
     def _check_ollama_connection(self) -> bool:
         """Check if Ollama is running and accessible.
 
+        A successful check is cached for OLLAMA_CHECK_TTL seconds.
+
         Returns:
             True if Ollama is accessible, False otherwise.
         """
+        if time.monotonic() < self._ollama_ok_until:
+            return True
+
         try:
-            import ollama
-            models = ollama.list()
+            ollama.list()
+            self._ollama_ok_until = time.monotonic() + OLLAMA_CHECK_TTL
             return True
         except Exception as e:
             self.console.print(f"[red]Error connecting to Ollama: {e}[/red]")
@@ -110,25 +139,39 @@ Type 'help' for available commands or 'quit' to exit.
             self.console.print("[red]No valid PDF files to process.[/red]")
             return
 
+        # PDFs are parsed in worker processes while the main thread feeds
+        # finished ones into the vector store, so parsing the next file
+        # overlaps with embedding the previous one. Workers are spawned
+        # rather than forked because the chat engine and the embedding
+        # client already run threads in this process.
+        max_workers = min(len(valid_paths), os.cpu_count() or 1)
         with Progress(
             SpinnerColumn(),
             TextColumn("[progress.description]{task.description}"),
             console=self.console
-        ) as progress:
+        ) as progress, ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as executor:
+            futures = {}
             for pdf_path in valid_paths:
                 task = progress.add_task(f"Processing {pdf_path.name}...", total=None)
-                
+                future = executor.submit(process_pdf_path, pdf_path)
+                futures[future] = (pdf_path, task)
+
+            for future in as_completed(futures):
+                pdf_path, task = futures[future]
                 try:
-                    # Process PDF
-                    chunks = self.pdf_processor.process_pdf(pdf_path)
-                    
+                    chunks = future.result()
+
                     if chunks:
                         # Add to vector store
+                        progress.update(task, description=f"Embedding {pdf_path.name}...")
                         self.vector_store.add_documents(chunks)
                         progress.update(task, description=f"✅ Processed {pdf_path.name} ({len(chunks)} chunks)")
                     else:
                         progress.update(task, description=f"⚠️  No text found in {pdf_path.name}")
-                        
+
                 except Exception as e:
                     progress.update(task, description=f"❌ Failed to process {pdf_path.name}: {e}")
                     logger.error(f"Failed to process {pdf_path}: {e}")
@@ -155,7 +198,7 @@ Type 'help' for available commands or 'quit' to exit.
             try:
                 user_input = self.console.input("[bold blue]You: [/bold blue]")
                 
-                if user_input.lower() in ['exit', 'quit', 'q']:
+                if user_input.lower() in _EXIT_WORDS:
                     break
                 
                 if not user_input.strip():
@@ -185,6 +228,7 @@ Type 'help' for available commands or 'quit' to exit.
 
     def list_sessions(self) -> None:
         """List all chat sessions."""
+        self.chat_engine.flush_history()
         sessions = self.history_manager.get_recent_sessions(20)
         
         if not sessions:
@@ -197,15 +241,16 @@ Type 'help' for available commands or 'quit' to exit.
         table.add_column("Created", style="green")
         table.add_column("Messages", style="yellow")
 
+        # Summarize the metadata already in hand rather than looking
+        # every session up again
         for session in sessions:
-            summary = self.history_manager.get_session_summary(session["id"])
-            if summary:
-                table.add_row(
-                    summary["id"],
-                    summary["name"],
-                    summary["created_at"][:19],  # Remove microseconds
-                    str(summary["total_messages"])
-                )
+            summary = HistoryManager.summarize(session)
+            table.add_row(
+                summary["id"],
+                summary["name"],
+                summary["created_at"][:19],  # Remove microseconds
+                str(summary["total_messages"])
+            )
 
         self.console.print(table)
 
@@ -233,6 +278,7 @@ Type 'help' for available commands or 'quit' to exit.
     def show_stats(self) -> None:
         """Show document and system statistics."""
         stats = self.vector_store.get_collection_stats()
+        self.chat_engine.flush_history()
         sessions = self.history_manager.get_all_sessions()
         
         table = Table(title="System Statistics")
@@ -245,7 +291,8 @@ Type 'help' for available commands or 'quit' to exit.
         
         if sessions:
             total_messages = sum(
-                len(s.get("messages", [])) for s in sessions
+                s.get("message_count", len(s.get("messages", [])))
+                for s in sessions
             )
             table.add_row("Total Messages", str(total_messages))
         
@@ -256,6 +303,7 @@ Type 'help' for available commands or 'quit' to exit.
         if click.confirm("Are you sure you want to clear all data? This cannot be undone."):
             try:
                 self.vector_store.clear_collection()
+                self.chat_engine.flush_history()
                 self.history_manager.clear_all_history()
                 self.console.print("[green]All data cleared successfully.[/green]")
             except Exception as e:
@@ -273,30 +321,24 @@ Type 'help' for available commands or 'quit' to exit.
                 if not command:
                     continue
                 
-                parts = command.split()
-                cmd = parts[0].lower()
-                args = parts[1:]
-                
-                if cmd == 'help':
-                    self._display_help()
-                elif cmd == 'upload':
-                    self.upload_pdfs(args)
-                elif cmd == 'chat':
-                    self.start_chat()
-                elif cmd == 'sessions':
-                    self.list_sessions()
-                elif cmd == 'load' and args:
-                    self.load_session(args[0])
-                elif cmd == 'stats':
-                    self.show_stats()
-                elif cmd == 'clear':
-                    self.clear_data()
-                elif cmd in ['quit', 'exit', 'q']:
+                cmd, _, rest = command.partition(' ')
+                cmd = cmd.lower()
+
+                if cmd in _EXIT_WORDS:
                     self.console.print("[yellow]Goodbye![/yellow]")
                     break
-                else:
+
+                handler, arity = self._commands.get(cmd, (None, 0))
+                args = rest.split() if arity else []
+                if handler is None or (arity > 0 and len(args) < arity):
                     self.console.print(f"[red]Unknown command: {cmd}[/red]")
                     self.console.print("Type 'help' for available commands.")
+                elif arity == 0:
+                    handler()
+                elif arity == -1:
+                    handler(args)
+                else:
+                    handler(*args[:arity])
                     
             except KeyboardInterrupt:
                 self.console.print("\n[yellow]Goodbye![/yellow]")
@@ -9,17 +9,39 @@ __version__ = "1.0.0"
 __author__ = "Your Name"
 __email__ = "your.email@example.com"
 
+from typing import Any
+
 from .chat_engine import ChatEngine
+from .chunk import Chunk
 from .config import APP_NAME
 from .history_manager import HistoryManager
-from .pdf_processor import PDFProcessor
 from .vector_store import VectorStore
 
 __all__ = [
     "ChatEngine",
+    "Chunk",
     "HistoryManager", 
     "PDFProcessor",
     "VectorStore",
+    "process_pdfs",
     "APP_NAME",
     "__version__",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    """Import the PDF processor, and with it PDFium and tiktoken, on first use.
+
+    Args:
+        name: Attribute looked up on the package.
+
+    Returns:
+        The requested attribute.
+
+    Raises:
+        AttributeError: If the package has no such attribute.
+    """
+    if name in ("PDFProcessor", "process_pdfs"):
+        from . import pdf_processor
+        return getattr(pdf_processor, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
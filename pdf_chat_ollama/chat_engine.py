@@ -1,16 +1,39 @@
 """Chat engine with Ollama integration and context retrieval."""
 
+import asyncio
+import atexit
 import logging
-from typing import Dict, List, Optional
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
 
+import httpx
 import ollama
 
-from .config import CHAT_MODEL, OLLAMA_BASE_URL, SYSTEM_PROMPT
+from .config import (
+    CHAT_MODEL,
+    HISTORY_WRITE_WINDOW,
+    OLLAMA_BASE_URL,
+    OLLAMA_POOL_SIZE,
+    SYSTEM_PROMPT,
+)
 from .history_manager import HistoryManager
-from .vector_store import VectorStore
+from .vector_store import SearchResults, VectorStore
 
 logger = logging.getLogger(__name__)
 
+# Fixed parts of the prompt, assembled once; only the context and the
+# question vary between turns
+_PROMPT_PREFIX = (
+    f"{SYSTEM_PROMPT}\n\n"
+    "Based on the following documents, please answer the user's question. "
+    "If the information is not available in the provided context, please "
+    "say so clearly.\n\nDocuments:\n"
+)
+_PROMPT_MID = "\n\nQuestion: "
+_PROMPT_SUFFIX = "\n\nAnswer:"
+
 
 class ChatEngine:
     """Handles chat interactions with Ollama and context retrieval."""
@@ -25,9 +48,30 @@ class ChatEngine:
         self.vector_store = vector_store
         self.history_manager = history_manager
         self.current_session_id: Optional[str] = None
-        
-        # Configure Ollama client - remove the incorrect initialization
-        # The ollama module uses a global client that's automatically configured
+
+        # Dedicated Ollama clients whose connection pools stay alive for the
+        # engine's lifetime, so turns after the first skip connection setup
+        limits = httpx.Limits(
+            max_connections=OLLAMA_POOL_SIZE,
+            max_keepalive_connections=OLLAMA_POOL_SIZE
+        )
+        self._client = ollama.Client(host=OLLAMA_BASE_URL, limits=limits)
+        self._async_client = ollama.AsyncClient(host=OLLAMA_BASE_URL, limits=limits)
+
+        # History writes are handed to a background thread so disk I/O
+        # overlaps with retrieval and generation instead of delaying replies
+        # None is the stop sentinel sent by close()
+        self._history_queue: "queue.Queue[Optional[Tuple[str, str, str, Optional[List[Dict]]]]]" = (
+            queue.Queue()
+        )
+        self._history_writer = threading.Thread(
+            target=self._drain_history_queue,
+            name="history-writer",
+            daemon=True
+        )
+        self._history_writer.start()
+        self._closed = False
+        atexit.register(self.close)
 
     def start_session(self, session_name: Optional[str] = None) -> str:
         """Start a new chat session.
@@ -60,11 +104,106 @@ class ChatEngine:
             logger.warning(f"Session not found: {session_id}")
             return False
 
-    def _format_context(self, chunks: List[Dict[str, str]]) -> str:
+    def _record_message(self, session_id: str, role: str, content: str,
+                        sources: Optional[List[Dict]] = None) -> None:
+        """Queue a message for persistence by the history writer thread.
+
+        Args:
+            session_id: ID of the session.
+            role: Role of the message sender ('user' or 'assistant').
+            content: Message content.
+            sources: Optional list of source documents used.
+
+        Raises:
+            RuntimeError: If the engine has been closed.
+        """
+        if self._closed:
+            raise RuntimeError("ChatEngine is closed")
+        self._history_queue.put((session_id, role, content, sources))
+
+    def _drain_history_queue(self) -> None:
+        """Write queued messages to history, coalescing bursts into one flush.
+
+        Runs on the history writer thread until close() sends the stop
+        sentinel. Messages arriving within HISTORY_WRITE_WINDOW seconds of
+        the first one are written in a single history batch.
+        """
+        stopping = False
+        while not stopping:
+            item = self._history_queue.get()
+            if item is None:
+                self._history_queue.task_done()
+                return
+            pending = [item]
+            deadline = time.monotonic() + HISTORY_WRITE_WINDOW
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._history_queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    # Write what has been gathered before stopping
+                    self._history_queue.task_done()
+                    stopping = True
+                    break
+                pending.append(item)
+
+            try:
+                with self.history_manager.batch():
+                    for session_id, role, content, sources in pending:
+                        # One bad message must not drop the rest of the
+                        # batch, which may belong to other sessions
+                        try:
+                            self.history_manager.add_message(session_id, role, content, sources)
+                        except Exception as e:
+                            logger.error(
+                                f"Failed to save {role} message for session {session_id}: {e}"
+                            )
+            except Exception as e:
+                logger.error(f"Failed to save chat history: {e}")
+            finally:
+                for _ in pending:
+                    self._history_queue.task_done()
+
+    def flush_history(self) -> None:
+        """Block until all queued history writes have been saved."""
+        self._history_queue.join()
+
+    def close(self) -> None:
+        """Save queued history writes and stop the history writer thread.
+
+        Safe to call more than once. Also runs at interpreter exit for
+        engines that were never closed explicitly.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._history_queue.put(None)
+        self._history_writer.join()
+        atexit.unregister(self.close)
+
+    def _retrieve_context(self, user_query: str) -> SearchResults:
+        """Retrieve document chunks relevant to a query.
+
+        Repeated and near-identical queries are served from the vector
+        store's query caches.
+
+        Args:
+            user_query: User's question.
+
+        Returns:
+            Relevant chunks with metadata and scores.
+        """
+        return self.vector_store.search_similar(user_query)
+
+    def _format_context(self, chunks: SearchResults) -> str:
         """Format retrieved chunks into context for the model.
 
         Args:
-            chunks: List of document chunks with metadata.
+            chunks: Document chunks with metadata.
 
         Returns:
             Formatted context string.
@@ -72,31 +211,42 @@ class ChatEngine:
         if not chunks:
             return "No relevant documents found."
 
-        context_parts = []
-        for i, chunk in enumerate(chunks, 1):
-            source_info = f"[Source: {chunk['filename']}, Page {chunk['page_number']}]"
-            context_parts.append(f"Document {i} {source_info}:\n{chunk['text']}\n")
+        # Sized up front and filled by index; the number of chunks is known
+        context_parts = [None] * len(chunks)
+        for i, (text, filename, page_number) in enumerate(
+            zip(chunks.texts, chunks.filenames, chunks.page_numbers.tolist())
+        ):
+            source_info = f"[Source: {filename}, Page {page_number}]"
+            context_parts[i] = f"Document {i + 1} {source_info}:\n{text}\n"
 
         return "\n".join(context_parts)
 
-    def _format_sources(self, chunks: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    def _format_sources(self, chunks: SearchResults) -> List[Dict[str, str]]:
         """Format source information for history.
 
         Args:
-            chunks: List of document chunks with metadata.
+            chunks: Document chunks with metadata.
 
         Returns:
             List of formatted source information.
         """
-        sources = []
-        for chunk in chunks:
-            sources.append({
-                "filename": chunk["filename"],
-                "page_number": chunk["page_number"],
-                "similarity_score": chunk.get("similarity_score", 0.0),
-                "preview": chunk["text"][:200] + "..." if len(chunk["text"]) > 200 else chunk["text"]
-            })
-        return sources
+        # Numeric columns are converted to Python values in one call each
+        # so the sources stay JSON serializable
+        return [
+            {
+                "filename": filename,
+                "page_number": page_number,
+                "similarity_score": score,
+                # Only long texts are sliced
+                "preview": (text[:200] + "...") if len(text) > 200 else text
+            }
+            for text, filename, page_number, score in zip(
+                chunks.texts,
+                chunks.filenames,
+                chunks.page_numbers.tolist(),
+                chunks.scores.tolist()
+            )
+        ]
 
     def _build_prompt(self, user_query: str, context: str) -> str:
         """Build the complete prompt for the model.
@@ -108,18 +258,7 @@ class ChatEngine:
         Returns:
             Complete prompt string.
         """
-        prompt = f"""{SYSTEM_PROMPT}
-
-Based on the following documents, please answer the user's question. If the information is not available in the provided context, please say so clearly.
-
-Documents:
-{context}
-
-Question: {user_query}
-
-Answer:"""
-        
-        return prompt
+        return "".join((_PROMPT_PREFIX, context, _PROMPT_MID, user_query, _PROMPT_SUFFIX))
 
     def chat(self, user_query: str) -> Dict[str, str]:
         """Process a user query and return a response.
@@ -139,7 +278,7 @@ Answer:"""
 
         try:
             # Save user message to history
-            self.history_manager.add_message(
+            self._record_message(
                 self.current_session_id, 
                 "user", 
                 user_query
@@ -147,8 +286,8 @@ Answer:"""
 
             # Retrieve relevant context
             logger.info(f"Searching for relevant context for query: {user_query[:50]}...")
-            relevant_chunks = self.vector_store.search_similar(user_query)
-            
+            relevant_chunks = self._retrieve_context(user_query)
+        
             if not relevant_chunks:
                 response_text = "I couldn't find any relevant information in the uploaded documents to answer your question."
                 sources = []
@@ -156,20 +295,20 @@ Answer:"""
                 # Format context and build prompt
                 context = self._format_context(relevant_chunks)
                 prompt = self._build_prompt(user_query, context)
-                
+            
                 # Generate response using Ollama
                 logger.info("Generating response with Ollama...")
-                response = ollama.chat(
+                response = self._client.chat(
                     model=CHAT_MODEL,
                     messages=[{"role": "user", "content": prompt}],
                     stream=False
                 )
-                
+            
                 response_text = response["message"]["content"]
                 sources = self._format_sources(relevant_chunks)
 
             # Save assistant response to history
-            self.history_manager.add_message(
+            self._record_message(
                 self.current_session_id,
                 "assistant", 
                 response_text,
@@ -185,14 +324,14 @@ Answer:"""
         except Exception as e:
             logger.error(f"Chat processing failed: {e}")
             error_response = f"I encountered an error while processing your question: {str(e)}"
-            
+        
             # Save error response to history
-            self.history_manager.add_message(
+            self._record_message(
                 self.current_session_id,
                 "assistant",
                 error_response
             )
-            
+        
             return {
                 "response": error_response,
                 "sources": [],
@@ -200,6 +339,117 @@ Answer:"""
                 "error": True
             }
 
+    async def achat(
+        self, user_query: str, session_id: Optional[str] = None
+    ) -> Dict[str, str]:
+        """Process a user query asynchronously and return a response.
+
+        Mirrors chat() but awaits the model through Ollama's async client,
+        so several queries can be in flight at once. Retrieval runs in the
+        default executor to keep the event loop free. The question and its
+        answer are recorded together once the answer is ready, so
+        concurrent queries never interleave within a session's history.
+
+        Args:
+            user_query: User's question.
+            session_id: Session to record the exchange in; defaults to the
+                current session at the time of the call.
+
+        Returns:
+            Dictionary containing response and metadata.
+
+        Raises:
+            ValueError: If no session is given or active.
+        """
+        session_id = session_id or self.current_session_id
+        if not session_id:
+            raise ValueError("No active chat session. Start a session first.")
+
+        loop = asyncio.get_running_loop()
+
+        try:
+            logger.info(f"Searching for relevant context for query: {user_query[:50]}...")
+            relevant_chunks = await loop.run_in_executor(
+                None, self._retrieve_context, user_query
+            )
+
+            if not relevant_chunks:
+                response_text = "I couldn't find any relevant information in the uploaded documents to answer your question."
+                sources = []
+            else:
+                context = self._format_context(relevant_chunks)
+                prompt = self._build_prompt(user_query, context)
+
+                logger.info("Generating response with Ollama...")
+                response = await self._async_client.chat(
+                    model=CHAT_MODEL,
+                    messages=[{"role": "user", "content": prompt}],
+                    stream=False
+                )
+
+                response_text = response["message"]["content"]
+                sources = self._format_sources(relevant_chunks)
+
+            # No await between the two, so the pair stays adjacent
+            self._record_message(session_id, "user", user_query)
+            self._record_message(
+                session_id,
+                "assistant",
+                response_text,
+                sources
+            )
+
+            return {
+                "response": response_text,
+                "sources": sources,
+                "session_id": session_id
+            }
+
+        except Exception as e:
+            logger.error(f"Chat processing failed: {e}")
+            error_response = f"I encountered an error while processing your question: {str(e)}"
+
+            self._record_message(session_id, "user", user_query)
+            self._record_message(
+                session_id,
+                "assistant",
+                error_response
+            )
+
+            return {
+                "response": error_response,
+                "sources": [],
+                "session_id": session_id,
+                "error": True
+            }
+
+    async def achat_many(
+        self, user_queries: List[str], session_id: Optional[str] = None
+    ) -> List[Dict[str, str]]:
+        """Process several user queries concurrently.
+
+        How many requests Ollama actually serves in parallel is governed
+        by its OLLAMA_NUM_PARALLEL setting. Each question is recorded
+        right before its answer, with the pairs in completion order.
+
+        Args:
+            user_queries: User questions.
+            session_id: Session to record the exchanges in; defaults to the
+                current session at the time of the call.
+
+        Returns:
+            Responses in the same order as the queries.
+
+        Raises:
+            ValueError: If no session is given or active.
+        """
+        session_id = session_id or self.current_session_id
+        if not session_id:
+            raise ValueError("No active chat session. Start a session first.")
+        return list(await asyncio.gather(
+            *(self.achat(query, session_id) for query in user_queries)
+        ))
+
     def stream_chat(self, user_query: str):
         """Process a user query and stream the response.
 
@@ -207,7 +457,9 @@ Answer:"""
             user_query: User's question.
 
         Yields:
-            Dictionary containing response chunks and metadata.
+            Response text fragments as strings, followed by a single final
+            dictionary with ``done``, ``sources`` and ``session_id`` keys
+            (plus ``response`` and ``error`` if processing failed).
 
         Raises:
             ValueError: If no session is active.
@@ -218,7 +470,7 @@ Answer:"""
 
         try:
             # Save user message to history
-            self.history_manager.add_message(
+            self._record_message(
                 self.current_session_id, 
                 "user", 
                 user_query
@@ -226,25 +478,25 @@ Answer:"""
 
             # Retrieve relevant context
             logger.info(f"Searching for relevant context for query: {user_query[:50]}...")
-            relevant_chunks = self.vector_store.search_similar(user_query)
-            
+            relevant_chunks = self._retrieve_context(user_query)
+        
             if not relevant_chunks:
                 response_text = "I couldn't find any relevant information in the uploaded documents to answer your question."
                 sources = []
-                
+            
                 # Save response to history
-                self.history_manager.add_message(
+                self._record_message(
                     self.current_session_id,
                     "assistant", 
                     response_text,
                     sources
                 )
-                
+            
+                yield response_text
                 yield {
-                    "response": response_text,
+                    "done": True,
                     "sources": sources,
-                    "session_id": self.current_session_id,
-                    "done": True
+                    "session_id": self.current_session_id
                 }
                 return
 
@@ -255,49 +507,51 @@ Answer:"""
 
             # Stream response using Ollama
             logger.info("Streaming response with Ollama...")
-            response_text = ""
-            
-            stream = ollama.chat(
+            response_parts = []
+        
+            stream = self._client.chat(
                 model=CHAT_MODEL,
                 messages=[{"role": "user", "content": prompt}],
                 stream=True
             )
 
             for chunk in stream:
-                if chunk["message"]["content"]:
-                    response_text += chunk["message"]["content"]
-                    yield {
-                        "response": chunk["message"]["content"],
-                        "sources": sources if chunk.get("done", False) else [],
-                        "session_id": self.current_session_id,
-                        "done": chunk.get("done", False)
-                    }
+                content = chunk["message"]["content"]
+                if content:
+                    response_parts.append(content)
+                    yield content
 
             # Save complete response to history
-            self.history_manager.add_message(
+            self._record_message(
                 self.current_session_id,
                 "assistant", 
-                response_text,
+                "".join(response_parts),
                 sources
             )
 
+            yield {
+                "done": True,
+                "sources": sources,
+                "session_id": self.current_session_id
+            }
+
         except Exception as e:
             logger.error(f"Stream chat processing failed: {e}")
             error_response = f"I encountered an error while processing your question: {str(e)}"
-            
+        
             # Save error response to history
-            self.history_manager.add_message(
+            self._record_message(
                 self.current_session_id,
                 "assistant",
                 error_response
             )
-            
+        
             yield {
+                "done": True,
                 "response": error_response,
                 "sources": [],
                 "session_id": self.current_session_id,
-                "error": True,
-                "done": True
+                "error": True
             }
 
     def get_session_history(self) -> List[Dict]:
@@ -308,7 +562,8 @@ Answer:"""
         """
         if not self.current_session_id:
             return []
-        
+
+        self.flush_history()
         session = self.history_manager.get_session(self.current_session_id)
         return session.get("messages", []) if session else []
 
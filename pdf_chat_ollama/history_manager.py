@@ -1,55 +1,373 @@
 """Chat history management with persistent storage."""
 
+import atexit
+import hashlib
 import json
 import logging
+import os
+import re
+import threading
+import weakref
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional
 
-from .config import HISTORY_DB_PATH
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+from .config import (
+    HISTORY_DB_PATH,
+    HISTORY_INDEX_PATH,
+    SESSIONS_DIR,
+    ensure_data_dir,
+)
 
 logger = logging.getLogger(__name__)
 
+# Session IDs that can be used as a log file name as they are; any other ID
+# (path separators, leading dots, overly long names) is hashed instead
+_SAFE_SESSION_ID = re.compile(r'[\w-][\w.-]{0,199}')
+
+# Managers with possibly unsaved changes, flushed at interpreter exit. The
+# set holds weak references so a dropped manager can still be collected.
+_LIVE_MANAGERS: "weakref.WeakSet[HistoryManager]" = weakref.WeakSet()
+
+
+def _flush_live_managers() -> None:
+    """Persist pending changes of every history manager still alive."""
+    for manager in list(_LIVE_MANAGERS):
+        try:
+            manager.flush()
+        except Exception as e:
+            logger.error(f"Failed to save chat history on exit: {e}")
+
+
+atexit.register(_flush_live_managers)
+
+
+def _json_dumps(obj: Any, pretty: bool = False) -> bytes:
+    """Encode an object as UTF-8 JSON using the fastest available library.
+
+    Args:
+        obj: Object to encode.
+        pretty: Indent the output for human readers.
+
+    Returns:
+        Encoded JSON bytes.
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(
+        obj, ensure_ascii=False, separators=(',', ':')
+    ).encode('utf-8')
+
+
+def _json_loads(data: bytes) -> Any:
+    """Decode UTF-8 JSON bytes using the fastest available library.
+
+    Args:
+        data: JSON bytes to decode.
+
+    Returns:
+        Decoded object.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data.decode('utf-8'))
+
 
 class HistoryManager:
-    """Manages chat history persistence and retrieval."""
+    """Manages chat history persistence and retrieval.
+
+    Session metadata lives in a small index file, while each session's
+    messages are kept in an append-only JSON Lines log so that adding a
+    message never rewrites the rest of the history. Message logs are
+    only read when a session is actually requested.
+    """
 
     def __init__(self) -> None:
         """Initialize the history manager."""
-        self.history_file = HISTORY_DB_PATH
+        self.history_file = HISTORY_INDEX_PATH
+        self.sessions_dir = SESSIONS_DIR
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._batch_depth = 0
+        ensure_data_dir()
+        self.sessions_dir.mkdir(exist_ok=True)
+        self._migrate_legacy_history()
         self._ensure_history_file_exists()
+        self._history = self._load_history()
+        self._messages: Dict[str, List[Dict]] = {}
+        self._index: Dict[str, Dict] = {}
+        self._rebuild_index()
+        self._backfill_message_counts()
+        _LIVE_MANAGERS.add(self)
+
+    def __del__(self) -> None:
+        """Persist pending changes when the manager is garbage collected."""
+        try:
+            self.flush()
+        except Exception:
+            pass
 
     def _ensure_history_file_exists(self) -> None:
         """Ensure the history file exists with proper structure."""
         if not self.history_file.exists():
             self._save_history({"sessions": []})
 
-    def _load_history(self) -> Dict:
+    def _migrate_legacy_history(self) -> None:
+        """Split a single-file chat history into the index and session logs."""
+        legacy_file = HISTORY_DB_PATH
+        if self.history_file.exists() or not legacy_file.exists():
+            return
+
+        legacy_history = self._load_history(legacy_file)
+        for session in legacy_history["sessions"]:
+            messages = session.get("messages", [])
+            self._write_messages(session["id"], messages)
+            session["message_count"] = len(messages)
+        self._save_history(legacy_history)
+
+        backup_file = legacy_file.with_suffix('.json.bak')
+        os.replace(legacy_file, backup_file)
+        logger.info(f"Migrated chat history to {self.sessions_dir}, "
+                    f"previous file kept at {backup_file}")
+
+    def _session_file(self, session_id: str) -> Path:
+        """Get the path of a session's message log.
+
+        Args:
+            session_id: ID of the session.
+
+        Returns:
+            Path to the session's JSON Lines file, always inside the
+            sessions directory.
+        """
+        if _SAFE_SESSION_ID.fullmatch(session_id):
+            return self.sessions_dir / f"{session_id}.jsonl"
+        # '@' never appears in a safe ID, so hashed names cannot collide
+        # with readable ones
+        digest = hashlib.blake2b(session_id.encode('utf-8'), digest_size=16)
+        return self.sessions_dir / f"@{digest.hexdigest()}.jsonl"
+
+    def _encode_message(self, message: Dict) -> bytes:
+        """Encode a message as a single JSON Lines record.
+
+        Args:
+            message: Message to encode.
+
+        Returns:
+            Encoded message terminated by a newline.
+        """
+        return _json_dumps(message) + b'\n'
+
+    def _write_messages(self, session_id: str, messages: List[Dict]) -> None:
+        """Write a session's complete message log.
+
+        Args:
+            session_id: ID of the session.
+            messages: Messages to write.
+        """
+        data = b''.join(self._encode_message(m) for m in messages)
+        with open(self._session_file(session_id), 'wb') as f:
+            f.write(data)
+
+    def _append_message(self, session_id: str, message: Dict) -> None:
+        """Append a single message to a session's log.
+
+        Args:
+            session_id: ID of the session.
+            message: Message to append.
+        """
+        with open(self._session_file(session_id), 'ab') as f:
+            f.write(self._encode_message(message))
+
+    def _load_messages(self, session_id: str) -> List[Dict]:
+        """Load all messages of a session from its log.
+
+        Args:
+            session_id: ID of the session.
+
+        Returns:
+            List of messages, empty if the log does not exist.
+        """
+        try:
+            with open(self._session_file(session_id), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return []
+
+        messages = []
+        for line in data.splitlines():
+            if not line.strip():
+                continue
+            try:
+                messages.append(_json_loads(line))
+            except json.JSONDecodeError as e:
+                logger.warning(f"Skipping corrupt message in session {session_id}: {e}")
+        return messages
+
+    def _backfill_message_counts(self) -> None:
+        """Recount messages for index entries that are missing or stale.
+
+        A log modified no earlier than the index was last written may hold
+        messages the index has not counted yet, e.g. after a crash between
+        appending a message and flushing the index, so it is recounted.
+        """
+        try:
+            index_mtime = self.history_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            index_mtime = -1
+        for session in self._history["sessions"]:
+            log_file = self._session_file(session["id"])
+            try:
+                log_mtime: Optional[int] = log_file.stat().st_mtime_ns
+            except FileNotFoundError:
+                log_mtime = None
+            if "message_count" in session and (log_mtime is None or log_mtime < index_mtime):
+                continue
+            count = 0
+            if log_mtime is not None:
+                with open(log_file, 'rb') as f:
+                    count = f.read().count(b'\n')
+            if session.get("message_count") != count:
+                session["message_count"] = count
+                self._dirty = True
+        self._flush()
+
+    def _get_messages(self, session_id: str) -> List[Dict]:
+        """Get a session's messages, reading its log on first access.
+
+        Args:
+            session_id: ID of the session.
+
+        Returns:
+            List of messages of the session.
+        """
+        messages = self._messages.get(session_id)
+        if messages is None:
+            messages = self._load_messages(session_id)
+            self._messages[session_id] = messages
+        return messages
+
+    def _rebuild_index(self) -> None:
+        """Rebuild the session ID lookup table from the loaded history."""
+        self._index = {s["id"]: s for s in self._history["sessions"]}
+
+    def _mark_dirty(self) -> None:
+        """Mark the in-memory history as changed and write it back."""
+        self._dirty = True
+        self._flush()
+
+    def _flush(self, force: bool = False) -> None:
+        """Write the in-memory history to disk if it has pending changes.
+
+        Args:
+            force: Write even when inside a batch.
+        """
+        with self._lock:
+            if not self._dirty or (self._batch_depth and not force):
+                return
+            self._save_history(self._history)
+            self._dirty = False
+
+    def flush(self) -> None:
+        """Persist any pending history changes to disk."""
+        self._flush(force=True)
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """Defer index writes until the end of the block.
+
+        Messages are still appended to their session logs immediately;
+        only the index rewrite is coalesced into a single flush.
+
+        Yields:
+            None.
+        """
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+            self._flush()
+
+    def _load_history(self, history_file: Optional[Path] = None) -> Dict:
         """Load chat history from file.
 
+        Args:
+            history_file: File to load, defaults to the session index.
+
         Returns:
             Dictionary containing chat history data.
         """
         try:
-            with open(self.history_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            with open(history_file or self.history_file, 'rb') as f:
+                data = f.read()
+            return _json_loads(data)
         except (FileNotFoundError, json.JSONDecodeError) as e:
             logger.warning(f"Failed to load history: {e}. Creating new history.")
             return {"sessions": []}
 
     def _save_history(self, history_data: Dict) -> None:
-        """Save chat history to file.
+        """Save the session index to file.
+
+        Messages are stored in the per-session logs and are left out of
+        the index. The data is written to a temporary file which then
+        atomically replaces the index, so a crash mid-write never leaves
+        a truncated file behind.
 
         Args:
             history_data: Dictionary containing chat history data.
         """
+        history_data = {
+            "sessions": [
+                {k: v for k, v in s.items() if k != "messages"}
+                for s in history_data["sessions"]
+            ]
+        }
+        data = _json_dumps(history_data)
+
+        tmp_file = self.history_file.with_suffix('.json.tmp')
         try:
-            with open(self.history_file, 'w', encoding='utf-8') as f:
-                json.dump(history_data, f, indent=2, ensure_ascii=False)
+            with open(tmp_file, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.history_file)
         except Exception as e:
             logger.error(f"Failed to save history: {e}")
             raise
 
+    def dump_pretty(self, file_path: Path) -> None:
+        """Write the full history, messages included, as indented JSON.
+
+        The files managed by this class are stored compactly; this is
+        meant for inspecting the history by hand.
+
+        Args:
+            file_path: Path to write the history to.
+        """
+        with self._lock:
+            history_data = {
+                "sessions": [
+                    self.get_session(s["id"]) for s in self._history["sessions"]
+                ]
+            }
+        data = _json_dumps(history_data, pretty=True)
+        with open(file_path, 'wb') as f:
+            f.write(data)
+
     def create_session(self, session_name: Optional[str] = None) -> str:
         """Create a new chat session.
 
@@ -59,21 +377,24 @@ class HistoryManager:
         Returns:
             Session ID.
         """
-        history = self._load_history()
-        
-        session_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        now = datetime.now()
+        session_id = now.strftime("%Y%m%d_%H%M%S")
         if session_name:
             session_id = f"{session_id}_{session_name}"
         
         new_session = {
             "id": session_id,
             "name": session_name or f"Session {session_id}",
-            "created_at": datetime.now().isoformat(),
-            "messages": []
+            "created_at": now.isoformat(),
+            "message_count": 0
         }
-        
-        history["sessions"].append(new_session)
-        self._save_history(history)
+
+        with self._lock:
+            self._session_file(session_id).touch()
+            self._messages[session_id] = []
+            self._history["sessions"].append(new_session)
+            self._index[session_id] = new_session
+            self._mark_dirty()
         
         logger.info(f"Created new session: {session_id}")
         return session_id
@@ -93,29 +414,26 @@ class HistoryManager:
             content: Message content.
             sources: Optional list of source documents used.
         """
-        history = self._load_history()
-        
-        # Find the session
-        session = None
-        for s in history["sessions"]:
-            if s["id"] == session_id:
-                session = s
-                break
-        
-        if not session:
-            raise ValueError(f"Session {session_id} not found")
-        
-        message = {
-            "role": role,
-            "content": content,
-            "timestamp": datetime.now().isoformat(),
-            "sources": sources or []
-        }
-        
-        session["messages"].append(message)
-        session["updated_at"] = datetime.now().isoformat()
-        
-        self._save_history(history)
+        now_iso = datetime.now().isoformat()
+        with self._lock:
+            session = self._index.get(session_id)
+            if not session:
+                raise ValueError(f"Session {session_id} not found")
+
+            message = {
+                "role": role,
+                "content": content,
+                "timestamp": now_iso,
+                "sources": sources or []
+            }
+
+            self._append_message(session_id, message)
+            if session_id in self._messages:
+                self._messages[session_id].append(message)
+            session["message_count"] = session.get("message_count", 0) + 1
+            session["updated_at"] = now_iso
+
+            self._mark_dirty()
         logger.debug(f"Added {role} message to session {session_id}")
 
     def get_session(self, session_id: str) -> Optional[Dict]:
@@ -125,32 +443,26 @@ class HistoryManager:
             session_id: ID of the session to retrieve.
 
         Returns:
-            Session data or None if not found.
+            Session data including its messages, or None if not found.
         """
-        history = self._load_history()
-        
-        for session in history["sessions"]:
-            if session["id"] == session_id:
-                return session
-        
-        return None
+        with self._lock:
+            session = self._index.get(session_id)
+            if session is None:
+                return None
+            return {**session, "messages": list(self._get_messages(session_id))}
 
     def get_all_sessions(self) -> List[Dict]:
         """Get all chat sessions.
 
+        Sessions are kept in the order they were added, so the newest
+        ones are simply at the end of the list. Only session metadata is
+        returned; use get_session to load the messages.
+
         Returns:
-            List of all sessions sorted by creation date (newest first).
+            List of all sessions, newest first.
         """
-        history = self._load_history()
-        
-        # Sort by creation date (newest first)
-        sessions = sorted(
-            history["sessions"], 
-            key=lambda x: x.get("created_at", ""), 
-            reverse=True
-        )
-        
-        return sessions
+        with self._lock:
+            return self._history["sessions"][::-1]
 
     def get_recent_sessions(self, limit: int = 10) -> List[Dict]:
         """Get recent chat sessions.
@@ -159,10 +471,12 @@ class HistoryManager:
             limit: Maximum number of sessions to return.
 
         Returns:
-            List of recent sessions.
+            List of recent session metadata, newest first.
         """
-        sessions = self.get_all_sessions()
-        return sessions[:limit]
+        if limit <= 0:
+            return []
+        with self._lock:
+            return self._history["sessions"][-limit:][::-1]
 
     def delete_session(self, session_id: str) -> bool:
         """Delete a chat session.
@@ -173,24 +487,31 @@ class HistoryManager:
         Returns:
             True if session was deleted, False if not found.
         """
-        history = self._load_history()
-        
-        original_count = len(history["sessions"])
-        history["sessions"] = [
-            s for s in history["sessions"] 
-            if s["id"] != session_id
-        ]
-        
-        if len(history["sessions"]) < original_count:
-            self._save_history(history)
-            logger.info(f"Deleted session: {session_id}")
-            return True
-        
-        return False
+        with self._lock:
+            session = self._index.pop(session_id, None)
+            if session is None:
+                return False
+
+            self._history["sessions"] = [
+                s for s in self._history["sessions"] if s is not session
+            ]
+            self._messages.pop(session_id, None)
+            self._mark_dirty()
+            self._session_file(session_id).unlink(missing_ok=True)
+
+        logger.info(f"Deleted session: {session_id}")
+        return True
 
     def clear_all_history(self) -> None:
         """Clear all chat history."""
-        self._save_history({"sessions": []})
+        with self._lock:
+            self._history = {"sessions": []}
+            self._messages = {}
+            self._index = {}
+            self._dirty = True
+            self.flush()
+            for session_file in self.sessions_dir.glob("*.jsonl"):
+                session_file.unlink()
         logger.info("Cleared all chat history")
 
     def get_session_summary(self, session_id: str) -> Optional[Dict]:
@@ -205,19 +526,51 @@ class HistoryManager:
         session = self.get_session(session_id)
         if not session:
             return None
-        
-        messages = session.get("messages", [])
-        user_messages = [m for m in messages if m["role"] == "user"]
-        assistant_messages = [m for m in messages if m["role"] == "assistant"]
-        
+        return self.summarize(session)
+
+    @staticmethod
+    def summarize(session: Dict) -> Dict:
+        """Summarize an already loaded session.
+
+        Works on both full sessions and the metadata returned by
+        get_all_sessions. Without messages, the role counts and the last
+        message are None.
+
+        Args:
+            session: Session data.
+
+        Returns:
+            Session summary.
+        """
+        messages = session.get("messages")
+        if messages is None:
+            return {
+                "id": session["id"],
+                "name": session["name"],
+                "created_at": session["created_at"],
+                "updated_at": session.get("updated_at"),
+                "total_messages": session.get("message_count", 0),
+                "user_messages": None,
+                "assistant_messages": None,
+                "last_message": None
+            }
+
+        user_messages = assistant_messages = 0
+        for message in messages:
+            role = message["role"]
+            if role == "user":
+                user_messages += 1
+            elif role == "assistant":
+                assistant_messages += 1
+
         return {
             "id": session["id"],
             "name": session["name"],
             "created_at": session["created_at"],
             "updated_at": session.get("updated_at"),
-            "total_messages": len(messages),
-            "user_messages": len(user_messages),
-            "assistant_messages": len(assistant_messages),
+            "total_messages": session.get("message_count", len(messages)),
+            "user_messages": user_messages,
+            "assistant_messages": assistant_messages,
             "last_message": messages[-1] if messages else None
         }
 
@@ -234,10 +587,11 @@ class HistoryManager:
         session = self.get_session(session_id)
         if not session:
             return False
-        
+
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(session, f, indent=2, ensure_ascii=False)
+            data = _json_dumps(session, pretty=True)
+            with open(file_path, 'wb') as f:
+                f.write(data)
             logger.info(f"Exported session {session_id} to {file_path}")
             return True
         except Exception as e:
@@ -254,24 +608,31 @@ class HistoryManager:
             Session ID if import was successful, None otherwise.
         """
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                session_data = json.load(f)
+            with open(file_path, 'rb') as f:
+                data = f.read()
+            session_data = _json_loads(data)
             
             # Validate session data
-            if not all(key in session_data for key in ["id", "name", "created_at", "messages"]):
+            if (
+                not all(key in session_data for key in ["id", "name", "created_at", "messages"])
+                or not isinstance(session_data["id"], str)
+            ):
                 logger.error("Invalid session data format")
                 return None
             
-            history = self._load_history()
-            
-            # Check if session already exists
-            for existing_session in history["sessions"]:
-                if existing_session["id"] == session_data["id"]:
+            with self._lock:
+                # Check if session already exists
+                if session_data["id"] in self._index:
                     logger.warning(f"Session {session_data['id']} already exists")
                     return None
-            
-            history["sessions"].append(session_data)
-            self._save_history(history)
+
+                messages = session_data.pop("messages")
+                session_data["message_count"] = len(messages)
+                self._write_messages(session_data["id"], messages)
+                self._messages[session_data["id"]] = messages
+                self._history["sessions"].append(session_data)
+                self._index[session_data["id"]] = session_data
+                self._mark_dirty()
             
             logger.info(f"Imported session: {session_data['id']}")
             return session_data["id"]
@@ -1,27 +1,68 @@
 """PDF text extraction and chunking module."""
 
+import functools
+import hashlib
 import logging
+import os
+import pickle
+import re
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import chain
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
-import pdfplumber
+import pypdfium2 as pdfium
 import tiktoken
 
-from .config import CHUNK_SIZE, CHUNK_OVERLAP
+from .chunk import Chunk
+from .config import CHUNK_CACHE_DIR, CHUNK_OVERLAP, CHUNK_SIZE
 
 logger = logging.getLogger(__name__)
 
+# Sentence boundary: whitespace following terminal punctuation
+_SENT_SPLIT = re.compile(r'(?<=[.!?])\s+')
+
+# Overlap text is cut back to the first whitespace so it starts on a word
+_WHITESPACE = re.compile(r'\s')
+
+# Bytes that can only continue a multibyte UTF-8 character
+_UTF8_CONTINUATION = bytes(range(0x80, 0xC0))
+
+# PDFium is not thread-safe; every call into it within a process goes
+# through this lock, so PDFProcessor can be used from any thread
+_PDFIUM_LOCK = threading.Lock()
+
+# Bump when the layout of cached chunks or the chunking rules change
+_CHUNK_CACHE_VERSION = 5
+
+
+@functools.lru_cache(maxsize=1)
+def _get_enc() -> "tiktoken.Encoding":
+    """Load the tokenizer once and share it between all processors.
+
+    Returns:
+        The cl100k_base encoding.
+    """
+    return tiktoken.get_encoding("cl100k_base")
+
 
 class PDFProcessor:
     """Handles PDF text extraction and intelligent chunking."""
 
-    def __init__(self) -> None:
-        """Initialize the PDF processor with tokenizer."""
+    def __init__(self, cache_dir: Optional[Path] = CHUNK_CACHE_DIR) -> None:
+        """Initialize the PDF processor with tokenizer.
+
+        Args:
+            cache_dir: Directory for cached chunks, or None to disable caching.
+        """
         try:
-            self.tokenizer = tiktoken.get_encoding("cl100k_base")
+            self.tokenizer = _get_enc()
         except Exception as e:
             logger.warning(f"Failed to load tiktoken: {e}")
             self.tokenizer = None
+        self.cache_dir = cache_dir
 
     def extract_text_from_pdf(self, pdf_path: Path) -> List[Dict[str, str]]:
         """Extract text from PDF with page-level metadata.
@@ -41,16 +82,32 @@ class PDFProcessor:
 
         pages = []
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                for page_num, page in enumerate(pdf.pages, 1):
-                    text = page.extract_text()
-                    if text and text.strip():
-                        pages.append({
-                            "text": text.strip(),
-                            "page_number": page_num,
-                            "filename": pdf_path.name,
-                            "filepath": str(pdf_path)
-                        })
+            with _PDFIUM_LOCK:
+                # PDFium parses natively; its objects hold C memory, so close
+                # them as soon as each page is done
+                pdf = pdfium.PdfDocument(str(pdf_path))
+                try:
+                    for page_num in range(1, len(pdf) + 1):
+                        page = pdf[page_num - 1]
+                        textpage = page.get_textpage()
+                        try:
+                            text = textpage.get_text_range()
+                        finally:
+                            textpage.close()
+                            page.close()
+
+                        # PDFium ends lines with CRLF; keep the plain newlines
+                        # callers got from the previous extractor
+                        text = text.replace("\r\n", "\n").strip()
+                        if text:
+                            pages.append({
+                                "text": text,
+                                "page_number": page_num,
+                                "filename": pdf_path.name,
+                                "filepath": str(pdf_path)
+                            })
+                finally:
+                    pdf.close()
         except Exception as e:
             raise Exception(f"Failed to process PDF {pdf_path}: {e}")
 
@@ -67,7 +124,7 @@ class PDFProcessor:
             Number of tokens in the text.
         """
         if self.tokenizer:
-            return len(self.tokenizer.encode(text))
+            return len(self.tokenizer.encode_ordinary(text))
         # Fallback: approximate 1 token = 0.75 words
         return int(len(text.split()) * 1.33)
 
@@ -77,12 +134,12 @@ class PDFProcessor:
         metadata: Dict[str, str],
         chunk_size: int = CHUNK_SIZE,
         overlap: int = CHUNK_OVERLAP
-    ) -> List[Dict[str, str]]:
+    ) -> List[Chunk]:
         """Split text into overlapping chunks.
 
         Args:
             text: Text to chunk.
-            metadata: Metadata to include with each chunk.
+            metadata: The page_number, filename and filepath of each chunk.
             chunk_size: Maximum tokens per chunk.
             overlap: Number of tokens to overlap between chunks.
 
@@ -94,37 +151,71 @@ class PDFProcessor:
 
         # Split by sentences first for better chunking
         sentences = self._split_into_sentences(text)
+
+        # Encode each sentence once, then work with the token IDs instead
+        # of re-tokenizing growing chunks. Sentences are joined with a
+        # space, so every sentence but the first is encoded with it; the
+        # overlap is decoded from these IDs and would otherwise glue
+        # sentences together. encode_ordinary_batch would start a thread
+        # pool per call, inside the page and process pools.
+        if self.tokenizer:
+            encode = self.tokenizer.encode_ordinary
+            sentence_ids = [
+                encode(sentence if i == 0 else " " + sentence)
+                for i, sentence in enumerate(sentences)
+            ]
+        else:
+            sentence_ids = [None] * len(sentences)
+
+        # The current chunk is kept as a list of sentences and only
+        # joined into a string when it is emitted
         chunks = []
-        current_chunk = ""
+        current_parts: List[str] = []
+        current_ids: List[int] = []
         current_tokens = 0
 
-        for sentence in sentences:
-            sentence_tokens = self.count_tokens(sentence)
-            
+        for sentence, ids in zip(sentences, sentence_ids):
+            if ids is not None:
+                sentence_tokens = len(ids)
+            else:
+                sentence_tokens = self.count_tokens(sentence)
+
             # If adding this sentence would exceed chunk size
-            if current_tokens + sentence_tokens > chunk_size and current_chunk:
+            if current_tokens + sentence_tokens > chunk_size and current_parts:
                 # Save current chunk
-                chunks.append({
-                    "text": current_chunk.strip(),
-                    "tokens": current_tokens,
+                current_chunk = " ".join(current_parts)
+                chunks.append(Chunk(
+                    text=current_chunk.strip(),
+                    tokens=current_tokens,
                     **metadata
-                })
-                
+                ))
+
                 # Start new chunk with overlap
-                overlap_text = self._get_overlap_text(current_chunk, overlap)
-                current_chunk = overlap_text + " " + sentence
-                current_tokens = self.count_tokens(current_chunk)
+                overlap_text = self._get_overlap_text(
+                    current_chunk, overlap, current_ids
+                )
+                current_parts = [overlap_text, sentence]
+                if ids is not None:
+                    # The overlap is trimmed to whole words, so it no longer
+                    # matches the trailing token IDs exactly
+                    current_ids = self.tokenizer.encode_ordinary(overlap_text) + ids
+                    current_tokens = len(current_ids)
+                else:
+                    current_tokens = self.count_tokens(" ".join(current_parts))
             else:
-                current_chunk += " " + sentence if current_chunk else sentence
+                current_parts.append(sentence)
+                if ids is not None:
+                    current_ids.extend(ids)
                 current_tokens += sentence_tokens
 
         # Add final chunk
-        if current_chunk.strip():
-            chunks.append({
-                "text": current_chunk.strip(),
-                "tokens": current_tokens,
+        current_chunk = " ".join(current_parts).strip()
+        if current_chunk:
+            chunks.append(Chunk(
+                text=current_chunk,
+                tokens=current_tokens,
                 **metadata
-            })
+            ))
 
         return chunks
 
@@ -137,18 +228,23 @@ class PDFProcessor:
         Returns:
             List of sentences.
         """
-        import re
-        
-        # Simple sentence splitting
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-        return [s.strip() for s in sentences if s.strip()]
-
-    def _get_overlap_text(self, text: str, overlap_tokens: int) -> str:
+        # Splitting consumes every whitespace run between sentences, so
+        # once the ends are stripped no fragment is empty or padded
+        text = text.strip()
+        return _SENT_SPLIT.split(text) if text else []
+
+    def _get_overlap_text(
+        self,
+        text: str,
+        overlap_tokens: int,
+        token_ids: Optional[List[int]] = None
+    ) -> str:
         """Get the last N tokens from text for overlap.
 
         Args:
             text: Text to extract overlap from.
             overlap_tokens: Number of tokens to extract.
+            token_ids: Token IDs of the text, if already encoded.
 
         Returns:
             Overlap text.
@@ -162,45 +258,211 @@ class PDFProcessor:
 
         # Approximate tokens (fallback if no tokenizer)
         if self.tokenizer:
-            tokens = self.tokenizer.encode(text)
-            if len(tokens) <= overlap_tokens:
+            if not token_ids:
+                token_ids = self.tokenizer.encode_ordinary(text)
+            if len(token_ids) <= overlap_tokens:
                 return text
-            
-            # Find word boundary for overlap
-            overlap_text = ""
-            for word in reversed(words):
-                test_text = word + " " + overlap_text
-                if self.count_tokens(test_text) > overlap_tokens:
-                    break
-                overlap_text = test_text
-            return overlap_text.strip()
+
+            # The trailing token slice can start inside a multibyte
+            # character or a word: drop UTF-8 continuation bytes, then the
+            # partial word before the first whitespace
+            start = len(token_ids) - overlap_tokens
+            tail = self.tokenizer.decode_bytes(token_ids[start:])
+            tail = tail.lstrip(_UTF8_CONTINUATION).decode("utf-8", errors="replace")
+            previous = self.tokenizer.decode_single_token_bytes(token_ids[start - 1])
+            if not previous[-1:].isspace():
+                boundary = _WHITESPACE.search(tail)
+                tail = tail[boundary.start():] if boundary else ""
+            return tail.strip()
         else:
             # Fallback: use word count
             overlap_words = int(overlap_tokens * 0.75)  # Approximate
             return " ".join(words[-overlap_words:])
 
-    def process_pdf(self, pdf_path: Path) -> List[Dict[str, str]]:
+    def _chunk_page(self, page: Dict[str, str]) -> List[Chunk]:
+        """Chunk the text of a single extracted page.
+
+        Args:
+            page: Page text and metadata from extract_text_from_pdf.
+
+        Returns:
+            List of text chunks with metadata.
+        """
+        return self.chunk_text(
+            page["text"],
+            {
+                "page_number": page["page_number"],
+                "filename": page["filename"],
+                "filepath": page["filepath"]
+            }
+        )
+
+    def _cache_path(self, pdf_path: Path) -> Path:
+        """Get the chunk cache file for a PDF.
+
+        The key covers the file contents and every setting that affects
+        chunking, so edited files or changed settings miss the cache.
+
+        Args:
+            pdf_path: Path to the PDF file.
+
+        Returns:
+            Path of the cache file.
+        """
+        digest = hashlib.blake2b(digest_size=20)
+        with open(pdf_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+
+        tokenizer = self.tokenizer.name if self.tokenizer else "words"
+        return self.cache_dir / (
+            f"{digest.hexdigest()}_{CHUNK_SIZE}_{CHUNK_OVERLAP}"
+            f"_{tokenizer}_v{_CHUNK_CACHE_VERSION}.pkl"
+        )
+
+    def _load_cached_chunks(
+        self, cache_path: Path, pdf_path: Path
+    ) -> Optional[List[Chunk]]:
+        """Load previously cached chunks for a PDF.
+
+        Args:
+            cache_path: Cache file from _cache_path.
+            pdf_path: Path to the PDF file.
+
+        Returns:
+            List of text chunks with metadata, or None on a cache miss.
+        """
+        try:
+            with open(cache_path, "rb") as f:
+                chunks = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable chunk cache {cache_path}: {e}")
+            return None
+
+        # Identical content may have been cached under another path
+        filepath = str(pdf_path)
+        if chunks and chunks[0].filepath != filepath:
+            for chunk in chunks:
+                chunk.filename = pdf_path.name
+                chunk.filepath = filepath
+        return chunks
+
+    def _save_cached_chunks(
+        self, cache_path: Path, chunks: List[Chunk]
+    ) -> None:
+        """Write chunks to the cache, replacing the file atomically.
+
+        Each writer uses its own temporary file, so pool workers caching
+        the same PDF never write into each other's output.
+
+        Args:
+            cache_path: Cache file from _cache_path.
+            chunks: Text chunks with metadata.
+        """
+        tmp_path = None
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                dir=cache_path.parent, suffix=".tmp", delete=False
+            ) as f:
+                tmp_path = f.name
+                pickle.dump(chunks, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except Exception as e:
+            logger.warning(f"Failed to write chunk cache {cache_path}: {e}")
+            if tmp_path is not None:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+
+    def process_pdf(self, pdf_path: Path) -> List[Chunk]:
         """Process a PDF file and return chunked text.
 
+        Chunks are cached on disk keyed by the file's content hash, so
+        re-processing an unchanged PDF skips extraction and tokenization.
+
         Args:
             pdf_path: Path to the PDF file.
 
         Returns:
             List of text chunks with metadata.
         """
+        cache_path = None
+        if self.cache_dir is not None and pdf_path.exists():
+            cache_path = self._cache_path(pdf_path)
+            cached = self._load_cached_chunks(cache_path, pdf_path)
+            if cached is not None:
+                logger.info(f"Loaded {len(cached)} cached chunks for {pdf_path.name}")
+                return cached
+
         pages = self.extract_text_from_pdf(pdf_path)
-        all_chunks = []
-
-        for page in pages:
-            chunks = self.chunk_text(
-                page["text"], 
-                {
-                    "page_number": page["page_number"],
-                    "filename": page["filename"],
-                    "filepath": page["filepath"]
-                }
+        if not pages:
+            logger.info(f"Created 0 chunks from {pdf_path.name}")
+            return []
+
+        # Pages are chunked independently; tiktoken releases the GIL while
+        # encoding, so threads give real parallelism. map() keeps the
+        # chunks in page order.
+        max_workers = min(len(pages), os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            all_chunks = list(
+                chain.from_iterable(executor.map(self._chunk_page, pages))
             )
-            all_chunks.extend(chunks)
+
+        if cache_path is not None:
+            self._save_cached_chunks(cache_path, all_chunks)
 
         logger.info(f"Created {len(all_chunks)} chunks from {pdf_path.name}")
         return all_chunks
+
+
+# Processor shared by every PDF handled in this process; created lazily so
+# pool workers load the tokenizer once rather than once per file
+_process_processor: Optional[PDFProcessor] = None
+
+
+def process_pdf_path(pdf_path: Path) -> List[Chunk]:
+    """Process a PDF with this process's shared PDFProcessor.
+
+    Module-level so it can be sent to a process pool.
+
+    Args:
+        pdf_path: Path to the PDF file.
+
+    Returns:
+        List of text chunks with metadata.
+    """
+    global _process_processor
+    if _process_processor is None:
+        _process_processor = PDFProcessor()
+    return _process_processor.process_pdf(pdf_path)
+
+
+def process_pdfs(
+    pdf_paths: Iterable[Path],
+    max_workers: Optional[int] = None
+) -> List[Chunk]:
+    """Process several PDF files in parallel worker processes.
+
+    Each worker extracts and chunks whole files with its own tokenizer,
+    so the pipeline scales across cores without contending for the GIL.
+
+    Args:
+        pdf_paths: Paths to the PDF files.
+        max_workers: Number of worker processes, defaults to the CPU count.
+
+    Returns:
+        Text chunks with metadata of all files, in input order.
+    """
+    pdf_paths = list(pdf_paths)
+    if not pdf_paths:
+        return []
+
+    max_workers = min(len(pdf_paths), max_workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(
+            chain.from_iterable(executor.map(process_pdf_path, pdf_paths))
+        )
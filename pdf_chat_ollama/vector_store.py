@@ -1,18 +1,255 @@
 """Vector database operations using ChromaDB and Ollama embeddings."""
 
+import asyncio
+import hashlib
+import json
 import logging
-import uuid
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, Union
 
 import chromadb
+import httpx
+import numpy as np
 import ollama
+import requests
 from chromadb.config import Settings
+from requests.adapters import HTTPAdapter
 
-from .config import VECTOR_DB_PATH, EMBEDDING_MODEL, MAX_CONTEXT_CHUNKS, OLLAMA_BASE_URL
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import simsimd
+except ImportError:  # pragma: no cover - optional speedup
+    simsimd = None
+
+from .chunk import Chunk
+from .config import (
+    EMBED_BATCH_SIZE,
+    EMBED_CONCURRENCY,
+    EMBED_KEEP_ALIVE,
+    EMBED_NUM_BATCH,
+    EMBEDDING_MODEL,
+    MAX_CONTEXT_CHUNKS,
+    OLLAMA_BASE_URL,
+    OLLAMA_POOL_SIZE,
+    QUERY_CACHE_SIZE,
+    QUERY_CACHE_THRESHOLD,
+    VECTOR_DB_PATH,
+    ensure_data_dir,
+)
 
 logger = logging.getLogger(__name__)
 
+# /api/embed takes a list of inputs and embeds them in one pass
+_EMBED_URL = f"{OLLAMA_BASE_URL}/api/embed"
+
+# Statuses Ollama (or a proxy in front of it) uses to ask clients to slow
+# down, and the longest Retry-After delay honored for them
+_THROTTLE_STATUSES = frozenset((429, 503))
+_MAX_RETRY_AFTER = 60.0
+
+# Whitespace runs collapsed by VectorStore._clean_text
+_WS_RE = re.compile(r'\s+')
+
+# Punctuation kept by VectorStore._clean_text besides word characters
+# and whitespace
+_KEPT_PUNCTUATION = frozenset('.,!?;:-()[]"\'')
+
+# Text made only of characters VectorStore._clean_text keeps as they are;
+# without double spaces, such text needs no cleaning beyond strip()
+_CLEAN_ASCII_RE = re.compile(
+    '[A-Za-z0-9_ ' + re.escape(''.join(sorted(_KEPT_PUNCTUATION))) + ']*'
+)
+
+
+class _CleanTable(dict):
+    """str.translate table mapping disallowed characters to a space.
+
+    Entries are computed on first use, so only characters that actually
+    occur are ever classified. Word characters and whitespace follow the
+    same Unicode rules as the equivalent regex classes.
+    """
+
+    def __missing__(self, codepoint: int) -> int:
+        char = chr(codepoint)
+        if char.isalnum() or char == '_' or char.isspace() or char in _KEPT_PUNCTUATION:
+            replacement = codepoint
+        else:
+            replacement = ord(' ')
+        self[codepoint] = replacement
+        return replacement
+
+
+_CLEAN_TABLE = _CleanTable()
+
+# Embeddings are stored at unit length, so inner product ranks exactly like
+# cosine similarity without the per-comparison norm division
+_COLLECTION_METADATA = {
+    "description": "PDF document chunks",
+    "hnsw:space": "ip"
+}
+
+# Collections created before embeddings were normalized use Chroma's default
+# l2 space and hold raw vectors. They are copied and normalized into a
+# collection with the first suffix, which is renamed to the second once the
+# copy is complete and only then replaces the original.
+_MIGRATION_SUFFIX = "-ip-migration"
+_MIGRATED_SUFFIX = "-ip-migrated"
+_MIGRATION_BATCH_SIZE = 1000
+
+
+def _collection_space(collection: "chromadb.Collection") -> str:
+    """Get the distance function of a collection.
+
+    Args:
+        collection: ChromaDB collection.
+
+    Returns:
+        The HNSW space, such as "ip", "cosine" or "l2".
+    """
+    space = (collection.metadata or {}).get("hnsw:space")
+    if space is None:
+        # Newer Chroma releases keep it in the collection configuration
+        configuration = getattr(collection, "configuration", None) or {}
+        space = (configuration.get("hnsw") or {}).get("space")
+    return space or "l2"
+
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    """Work out how long to wait before retrying a failed embedding request.
+
+    Throttling responses that carry a Retry-After header are retried after
+    the delay the server asked for; everything else backs off
+    exponentially.
+
+    Args:
+        error: Exception raised by the failed attempt.
+        attempt: Zero-based number of the failed attempt.
+
+    Returns:
+        Delay in seconds.
+    """
+    response = getattr(error, "response", None)
+    if response is not None and response.status_code in _THROTTLE_STATUSES:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                # HTTP-date form
+                try:
+                    delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                except (TypeError, ValueError):
+                    delay = None
+            if delay is not None:
+                return min(max(delay, 0.0), _MAX_RETRY_AFTER)
+    return float(2 ** attempt)
+
+
+def _quantize(vector: np.ndarray) -> Tuple[np.ndarray, float]:
+    """Quantize a vector to int8 with a symmetric scale.
+
+    The error this adds to a cosine similarity is far below the query
+    cache threshold's margin.
+
+    Args:
+        vector: Float vector.
+
+    Returns:
+        The int8 vector and the scale that maps it back to floats.
+    """
+    scale = float(np.abs(vector).max()) / 127 or 1.0
+    return np.round(vector / scale).astype(np.int8), scale
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale vectors to unit length along the last axis.
+
+    A float32 array is scaled in place rather than copied, so callers must
+    pass arrays they own.
+
+    Args:
+        vectors: Vector or matrix of row vectors.
+
+    Returns:
+        Float32 array of unit-length vectors.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms += 1e-12
+    vectors /= norms
+    return vectors
+
+
+@dataclass
+class SearchResults:
+    """Search hits stored column-wise, best match first.
+
+    Numeric columns are numpy arrays so scores and pages can be filtered
+    or reranked with array operations; to_dicts() gives one dict per hit.
+    """
+
+    texts: List[str]
+    filenames: List[str]
+    filepaths: List[str]
+    page_numbers: np.ndarray
+    tokens: np.ndarray
+    scores: np.ndarray
+
+    @classmethod
+    def empty(cls) -> "SearchResults":
+        """Create a result set with no hits.
+
+        Returns:
+            Empty search results.
+        """
+        return cls(
+            texts=[],
+            filenames=[],
+            filepaths=[],
+            page_numbers=np.empty(0, dtype=np.int64),
+            tokens=np.empty(0, dtype=np.int64),
+            scores=np.empty(0, dtype=np.float32)
+        )
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def to_dicts(self) -> List[Dict]:
+        """Convert the hits to one dictionary per chunk.
+
+        Returns:
+            List of chunks with metadata and similarity scores.
+        """
+        return [
+            {
+                "text": text,
+                "filename": filename,
+                "page_number": page_number,
+                "filepath": filepath,
+                "tokens": tokens,
+                "similarity_score": score
+            }
+            for text, filename, page_number, filepath, tokens, score in zip(
+                self.texts,
+                self.filenames,
+                self.page_numbers.tolist(),
+                self.filepaths,
+                self.tokens.tolist(),
+                self.scores.tolist()
+            )
+        ]
+
 
 class VectorStore:
     """Manages vector storage and retrieval using ChromaDB and Ollama embeddings."""
@@ -26,7 +263,46 @@ class VectorStore:
         self.collection_name = collection_name
         self.client = None
         self.collection = None
+        # Bumped whenever the stored documents change, so callers caching
+        # search results know when to drop them
+        self.generation = 0
+
+        # Embeddings of recent queries keyed by cleaned text, so repeated
+        # questions skip the Ollama round trip; least recently used first.
+        # They do not depend on the stored documents and are never dropped
+        # because of changes to them.
+        self._embedding_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+        # Search results of recent queries keyed by query text, holding the
+        # row of the query's embedding, the number of results asked for and
+        # the results; least recently used first. The unit-length embeddings
+        # live in one contiguous int8 matrix with a float32 scale per row,
+        # allocated on first use, so a lookup is a single matrix-vector
+        # product over its first len(self._results_cache) rows against the
+        # float32 query.
+        self._results_cache: "OrderedDict[str, Tuple[int, int, SearchResults]]" = OrderedDict()
+        self._results_vectors: Optional[np.ndarray] = None
+        self._results_scales: Optional[np.ndarray] = None
+        self._results_row_keys: List[Optional[str]] = [None] * QUERY_CACHE_SIZE
+        self._results_generation = self.generation
+        self._cache_lock = threading.Lock()
+
         self.ollama_client = ollama.Client(host=OLLAMA_BASE_URL, timeout=60.0)
+
+        # Pooled keep-alive session for embedding requests, so repeated
+        # calls skip connection setup. Retries are handled in
+        # _get_embeddings_batch, not by urllib3.
+        self._session = requests.Session()
+        self._session.headers["Connection"] = "keep-alive"
+        self._session.mount(
+            "http://",
+            HTTPAdapter(
+                pool_connections=OLLAMA_POOL_SIZE,
+                pool_maxsize=2 * OLLAMA_POOL_SIZE,
+                max_retries=0
+            )
+        )
+        ensure_data_dir()
         self._initialize_client()
 
     def _initialize_client(self) -> None:
@@ -37,26 +313,115 @@ class VectorStore:
                 path=str(VECTOR_DB_PATH),
                 settings=Settings(anonymized_telemetry=False)
             )
-            
-            # Get or create collection
-            try:
-                self.collection = self.client.get_collection(self.collection_name)
-                logger.info(f"Loaded existing collection: {self.collection_name}")
-            except Exception as e:
-                # Collection doesn't exist, create it
-                # This catches NotFoundError and any other exceptions
-                logger.info(f"Collection not found, creating new one: {self.collection_name}")
-                self.collection = self.client.create_collection(
-                    name=self.collection_name,
-                    metadata={"description": "PDF document chunks"}
-                )
-                logger.info(f"Created new collection: {self.collection_name}")
-                
+            self.collection = self._open_collection()
+            logger.info(f"Opened collection: {self.collection_name}")
+
         except Exception as e:
             logger.error(f"Failed to initialize ChromaDB client: {e}")
             raise
 
-    def _get_embedding(self, text: str, max_retries: int = 3) -> List[float]:
+    def _open_collection(self) -> chromadb.Collection:
+        """Get the collection, creating it if it does not exist yet.
+
+        Chroma never embeds anything itself: every add and query passes
+        embeddings computed here, where they are batched, run concurrently
+        and cached, so no embedding function is attached. Collections that
+        do not use the inner product space are migrated to it.
+
+        Returns:
+            The ChromaDB collection.
+        """
+        self._finish_interrupted_migration()
+        collection = self.client.get_or_create_collection(
+            name=self.collection_name,
+            metadata=_COLLECTION_METADATA,
+            embedding_function=None
+        )
+        if _collection_space(collection) != "ip":
+            return self._migrate_collection(collection)
+        return collection
+
+    def _delete_collection_if_exists(self, name: str) -> None:
+        """Delete a collection, ignoring one that does not exist.
+
+        Args:
+            name: Name of the collection.
+        """
+        try:
+            self.client.delete_collection(name)
+        except Exception:
+            pass
+
+    def _migrate_collection(self, collection: chromadb.Collection) -> chromadb.Collection:
+        """Copy a collection into the inner product space.
+
+        Stored embeddings are normalized into a temporary collection. Only
+        once the copy is complete is it marked as such by renaming it, and
+        then it replaces the original, so an interrupted copy leaves the
+        original untouched.
+
+        Args:
+            collection: Collection using another distance function.
+
+        Returns:
+            The migrated collection.
+        """
+        space = _collection_space(collection)
+        logger.info(
+            f"Migrating collection {self.collection_name} from {space} to ip space "
+            f"({collection.count()} chunks)"
+        )
+        migrated = self.client.create_collection(
+            name=self.collection_name + _MIGRATION_SUFFIX,
+            metadata=_COLLECTION_METADATA,
+            embedding_function=None
+        )
+
+        offset = 0
+        while True:
+            page = collection.get(
+                include=["embeddings", "documents", "metadatas"],
+                limit=_MIGRATION_BATCH_SIZE,
+                offset=offset
+            )
+            if not page["ids"]:
+                break
+            migrated.add(
+                ids=page["ids"],
+                embeddings=_normalize(page["embeddings"]).tolist(),
+                documents=page["documents"],
+                metadatas=page["metadatas"]
+            )
+            offset += len(page["ids"])
+
+        migrated.modify(name=self.collection_name + _MIGRATED_SUFFIX)
+        self.client.delete_collection(self.collection_name)
+        migrated.modify(name=self.collection_name)
+        logger.info(f"Migrated {offset} chunks to ip space")
+        return migrated
+
+    def _finish_interrupted_migration(self) -> None:
+        """Clean up after a migration that was interrupted.
+
+        A completed copy replaces the original, which may or may not have
+        been deleted already; a partial copy is discarded, since the
+        original is only deleted after the copy completes.
+        """
+        self._delete_collection_if_exists(self.collection_name + _MIGRATION_SUFFIX)
+        try:
+            migrated = self.client.get_collection(
+                self.collection_name + _MIGRATED_SUFFIX,
+                embedding_function=None
+            )
+        except Exception:
+            # No completed migration waiting
+            return
+
+        logger.info(f"Finishing migration of collection {self.collection_name}")
+        self._delete_collection_if_exists(self.collection_name)
+        migrated.modify(name=self.collection_name)
+
+    def _get_embedding(self, text: str, max_retries: int = 3) -> np.ndarray:
         """Get embedding for text using Ollama.
 
         Args:
@@ -64,44 +429,229 @@ class VectorStore:
             max_retries: Maximum number of retry attempts.
 
         Returns:
-            Embedding vector.
+            Float32 embedding vector.
 
         Raises:
             Exception: If embedding generation fails after all retries.
         """
-        import time
-        import requests
-        import re
-        
-        # Clean the text to avoid issues with special characters
-        cleaned_text = self._clean_text(text)
+        return self._get_embeddings_batch([text], max_retries)[0]
+
+    def _get_embeddings_batch(
+        self,
+        texts: List[str],
+        max_retries: int = 3,
+        cleaned: bool = False
+    ) -> np.ndarray:
+        """Get embeddings for several texts with a single Ollama request.
+
+        Args:
+            texts: Texts to embed.
+            max_retries: Maximum number of retry attempts.
+            cleaned: The texts already went through _clean_text.
+
+        Returns:
+            Float32 matrix with one embedding row per text.
+
+        Raises:
+            Exception: If embedding generation fails after all retries.
+        """
+        payload = self._embed_payload(texts, cleaned)
         
         for attempt in range(max_retries):
             try:
                 # Use direct HTTP request instead of ollama client
-                url = f"{OLLAMA_BASE_URL}/api/embeddings"
-                payload = {
-                    "model": EMBEDDING_MODEL,
-                    "prompt": cleaned_text
-                }
-                
-                response = requests.post(url, json=payload, timeout=60)
+                response = self._session.post(_EMBED_URL, json=payload, timeout=120)
                 response.raise_for_status()
                 
-                data = response.json()
-                return data["embedding"]
+                return self._parse_embeddings(response.content, len(texts))
                 
             except Exception as e:
                 logger.warning(f"Embedding attempt {attempt + 1} failed: {e}")
                 if attempt < max_retries - 1:
-                    # Wait before retrying, with exponential backoff
-                    wait_time = 2 ** attempt
-                    logger.info(f"Retrying in {wait_time} seconds...")
+                    # Wait before retrying, as long as the server asked for
+                    # or with exponential backoff
+                    wait_time = _retry_delay(e, attempt)
+                    logger.info(f"Retrying in {wait_time:g} seconds...")
                     time.sleep(wait_time)
                 else:
                     logger.error(f"Failed to generate embedding after {max_retries} attempts: {e}")
                     raise Exception(f"Embedding generation failed: {e}")
     
+    async def _aget_embeddings_batch(
+        self,
+        client: httpx.AsyncClient,
+        semaphore: asyncio.Semaphore,
+        texts: List[str],
+        max_retries: int = 3
+    ) -> np.ndarray:
+        """Get embeddings for several texts without blocking the event loop.
+
+        Args:
+            client: Shared async HTTP client.
+            semaphore: Limits how many requests are in flight at once.
+            texts: Texts to embed.
+            max_retries: Maximum number of retry attempts.
+
+        Returns:
+            Float32 matrix with one embedding row per text.
+
+        Raises:
+            Exception: If embedding generation fails after all retries.
+        """
+        payload = self._embed_payload(texts)
+
+        for attempt in range(max_retries):
+            try:
+                # Hold a slot only while the request is in flight, not
+                # while backing off
+                async with semaphore:
+                    response = await client.post(_EMBED_URL, json=payload, timeout=120)
+                response.raise_for_status()
+
+                return self._parse_embeddings(response.content, len(texts))
+
+            except Exception as e:
+                logger.warning(f"Embedding attempt {attempt + 1} failed: {e}")
+                if attempt < max_retries - 1:
+                    wait_time = _retry_delay(e, attempt)
+                    logger.info(f"Retrying in {wait_time:g} seconds...")
+                    await asyncio.sleep(wait_time)
+                else:
+                    logger.error(f"Failed to generate embedding after {max_retries} attempts: {e}")
+                    raise Exception(f"Embedding generation failed: {e}")
+
+    async def _aembed_batch(
+        self,
+        client: httpx.AsyncClient,
+        semaphore: asyncio.Semaphore,
+        texts: List[str]
+    ) -> np.ndarray:
+        """Embed a batch, retrying item by item if the batch request fails.
+
+        A batch can fail as a whole (for example a timeout on a large
+        request) even though each text embeds fine on its own.
+
+        Args:
+            client: Shared async HTTP client.
+            semaphore: Limits how many requests are in flight at once.
+            texts: Texts to embed.
+
+        Returns:
+            Float32 matrix with one embedding row per text.
+
+        Raises:
+            Exception: If any text cannot be embedded on its own either.
+        """
+        try:
+            return await self._aget_embeddings_batch(client, semaphore, texts)
+        except Exception:
+            if len(texts) == 1:
+                raise
+            logger.warning(
+                f"Batch of {len(texts)} chunks failed, embedding them one by one"
+            )
+
+        # One attempt each; the batch attempts already covered transient errors
+        singles = await asyncio.gather(*(
+            self._aget_embeddings_batch(client, semaphore, [text], max_retries=1)
+            for text in texts
+        ))
+        return np.concatenate(singles)
+
+    async def _aembed_and_store(
+        self,
+        ids: List[str],
+        texts: List[str],
+        metadatas: List[Dict]
+    ) -> None:
+        """Embed texts in batches and upsert each batch as soon as it is ready.
+
+        Several embedding requests stay in flight while finished batches
+        are written to the collection, so only a few batches of vectors
+        are held in memory at any time.
+
+        Args:
+            ids: Chunk IDs.
+            texts: Chunk texts.
+            metadatas: Chunk metadata, aligned with the texts.
+        """
+        semaphore = asyncio.Semaphore(EMBED_CONCURRENCY)
+        limits = httpx.Limits(
+            max_connections=EMBED_CONCURRENCY,
+            max_keepalive_connections=EMBED_CONCURRENCY
+        )
+
+        async def embed(start: int) -> Tuple[int, np.ndarray]:
+            batch = texts[start:start + EMBED_BATCH_SIZE]
+            return start, await self._aembed_batch(client, semaphore, batch)
+
+        async with httpx.AsyncClient(limits=limits) as client:
+            tasks = [
+                asyncio.ensure_future(embed(start))
+                for start in range(0, len(texts), EMBED_BATCH_SIZE)
+            ]
+            stored = 0
+            try:
+                for next_batch in asyncio.as_completed(tasks):
+                    start, embeddings = await next_batch
+                    end = start + len(embeddings)
+                    self.collection.upsert(
+                        documents=texts[start:end],
+                        embeddings=_normalize(embeddings).tolist(),
+                        metadatas=metadatas[start:end],
+                        ids=ids[start:end]
+                    )
+                    # Invalidate cached results as soon as anything is stored
+                    self.generation += 1
+                    stored += end - start
+                    logger.debug(f"Stored {stored}/{len(texts)} chunks")
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+    def _embed_payload(self, texts: List[str], cleaned: bool = False) -> Dict:
+        """Build an /api/embed request body.
+
+        Args:
+            texts: Texts to embed.
+            cleaned: The texts already went through _clean_text.
+
+        Returns:
+            JSON payload embedding all texts in one pass.
+        """
+        # Clean the text to avoid issues with special characters. Keeping
+        # the model loaded avoids a reload between ingestion batches.
+        return {
+            "model": EMBEDDING_MODEL,
+            "input": texts if cleaned else [self._clean_text(text) for text in texts],
+            "keep_alive": EMBED_KEEP_ALIVE,
+            "options": {"num_batch": EMBED_NUM_BATCH}
+        }
+
+    def _parse_embeddings(self, content: bytes, count: int) -> np.ndarray:
+        """Extract the embeddings from an /api/embed response.
+
+        The body is mostly a long array of floats, so it is decoded with
+        orjson when available.
+
+        Args:
+            content: Raw response body.
+            count: Number of texts that were sent.
+
+        Returns:
+            Float32 matrix with one embedding row per text.
+
+        Raises:
+            ValueError: If the response does not hold one embedding per text.
+        """
+        data = orjson.loads(content) if orjson is not None else json.loads(content)
+
+        # One contiguous float32 buffer instead of a list of Python floats
+        embeddings = np.asarray(data["embeddings"], dtype=np.float32)
+        if embeddings.ndim != 2 or len(embeddings) != count:
+            raise ValueError(f"Expected {count} embeddings, got {len(embeddings)}")
+        return embeddings
+
     def _clean_text(self, text: str) -> str:
         """Clean text for embedding generation.
         
@@ -111,17 +661,29 @@ class VectorStore:
         Returns:
             Cleaned text.
         """
-        import re
-        
-        # Remove excessive whitespace and normalize
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Remove or replace problematic characters
-        text = re.sub(r'[^\w\s\.\,\!\?\;\:\-\(\)\[\]\"\']', ' ', text)
-        
         # Limit text length to avoid overwhelming the API
         # Based on testing, 1000 characters seems to be the safe limit
         max_length = 1000
+
+        # Fast path for typical queries, which are short and already clean
+        if (
+            len(text) <= max_length
+            and "  " not in text
+            and _CLEAN_ASCII_RE.fullmatch(text)
+        ):
+            return text.strip()
+
+        # Cleaning never lengthens text, so only a prefix can survive the
+        # cap below; the headroom leaves room for collapsed whitespace
+        text = text[:max_length * 4]
+
+        # Replace problematic characters in a single C-level pass
+        text = text.translate(_CLEAN_TABLE)
+        
+        # Remove excessive whitespace and normalize, including runs left
+        # by replaced characters
+        text = _WS_RE.sub(' ', text)
+        
         if len(text) > max_length:
             text = text[:max_length]
             # Try to end at a sentence boundary
@@ -131,51 +693,77 @@ class VectorStore:
         
         return text.strip()
 
-    def add_documents(self, chunks: List[Dict[str, str]]) -> None:
+    def add_documents(
+        self, chunks: Sequence[Union[Chunk, Mapping[str, Any]]]
+    ) -> None:
         """Add document chunks to the vector store.
 
+        Chunk IDs are derived from the chunk's file, page, position and
+        text, so adding the same chunks again is a no-op: chunks already
+        stored are skipped before embedding.
+
+        Embeddings are generated concurrently on a private event loop, so
+        this must not be called from a running event loop.
+
         Args:
-            chunks: List of text chunks with metadata.
+            chunks: Text chunks with metadata, as Chunk objects or in the
+                dictionary form with the same keys.
         """
         if not chunks:
             logger.warning("No chunks to add to vector store")
             return
 
+        chunks = [
+            chunk if isinstance(chunk, Chunk) else Chunk.from_dict(chunk)
+            for chunk in chunks
+        ]
+
         try:
+            # Deterministic IDs; duplicates within the batch are dropped
+            chunks_by_id = {}
+            page_positions: Dict[Tuple[str, int], int] = {}
+            for chunk in chunks:
+                page = (chunk.filepath, chunk.page_number)
+                position = page_positions.get(page, 0)
+                page_positions[page] = position + 1
+                chunk_id = hashlib.blake2b(
+                    f"{chunk.filepath}|{chunk.page_number}|{position}|{chunk.text}".encode(),
+                    digest_size=16
+                ).hexdigest()
+                chunks_by_id.setdefault(chunk_id, chunk)
+
+            # Only the IDs are needed; skip fetching documents and metadata
+            existing = set(
+                self.collection.get(ids=list(chunks_by_id), include=[])["ids"]
+            )
+            ids = [chunk_id for chunk_id in chunks_by_id if chunk_id not in existing]
+            if not ids:
+                logger.info(f"All {len(chunks)} chunks are already in the vector store")
+                return
+            if existing:
+                logger.info(f"Skipping {len(existing)} chunks already in the vector store")
+            chunks = [chunks_by_id[chunk_id] for chunk_id in ids]
+
             # Prepare data for ChromaDB
-            texts = [chunk["text"] for chunk in chunks]
+            texts = [chunk.text for chunk in chunks]
+            # Interned so every chunk of a file shares one name and path
+            # string, even when chunks come back from separate worker
+            # processes or the chunk cache
             metadatas = [
                 {
-                    "filename": chunk["filename"],
-                    "page_number": chunk["page_number"],
-                    "filepath": chunk["filepath"],
-                    "tokens": chunk.get("tokens", 0)
+                    "filename": sys.intern(chunk.filename),
+                    "page_number": chunk.page_number,
+                    "filepath": sys.intern(chunk.filepath),
+                    "tokens": chunk.tokens
                 }
                 for chunk in chunks
             ]
-            ids = [str(uuid.uuid4()) for _ in chunks]
-
-            # Generate embeddings
+            # Embed EMBED_BATCH_SIZE chunks per request with up to
+            # EMBED_CONCURRENCY requests in flight, storing each batch as it
+            # completes. A failure leaves earlier batches stored; re-adding
+            # skips them thanks to the deterministic IDs.
             logger.info(f"Generating embeddings for {len(chunks)} chunks...")
-            embeddings = []
-            for i, text in enumerate(texts):
-                if i % 10 == 0:
-                    logger.info(f"Processing chunk {i+1}/{len(texts)}")
-                embedding = self._get_embedding(text)
-                embeddings.append(embedding)
-                
-                # Add small delay between requests to avoid overwhelming Ollama
-                if i < len(texts) - 1:  # Don't delay after the last request
-                    import time
-                    time.sleep(0.1)  # 100ms delay
-
-            # Add to collection
-            self.collection.add(
-                documents=texts,
-                embeddings=embeddings,
-                metadatas=metadatas,
-                ids=ids
-            )
+            asyncio.run(self._aembed_and_store(ids, texts, metadatas))
 
             logger.info(f"Successfully added {len(chunks)} chunks to vector store")
 
@@ -187,55 +775,207 @@ class VectorStore:
         self, 
         query: str, 
         n_results: int = MAX_CONTEXT_CHUNKS
-    ) -> List[Dict[str, str]]:
+    ) -> SearchResults:
         """Search for similar document chunks.
 
+        Results are cached per query. A query whose embedding is within
+        QUERY_CACHE_THRESHOLD cosine similarity of a cached one, asking for
+        the same number of results, reuses that query's results instead of
+        searching the collection.
+
         Args:
             query: Search query.
             n_results: Number of results to return.
 
         Returns:
-            List of similar chunks with metadata and scores.
+            Similar chunks with metadata and scores, best match first.
         """
         if not query.strip():
-            return []
+            return SearchResults.empty()
 
         try:
-            # Generate query embedding
-            query_embedding = self._get_embedding(query)
+            query_embedding = self.embed_query(query)
+        except Exception as e:
+            logger.error(f"Failed to search vector store: {e}")
+            return SearchResults.empty()
+
+        cached = self._lookup_results(query_embedding, n_results)
+        if cached is not None:
+            logger.info("Reusing cached results for a similar query")
+            return cached
+
+        results = self.search_by_vector(query_embedding, n_results)
+        if results and QUERY_CACHE_SIZE > 0:
+            with self._cache_lock:
+                self._cache_results(query, query_embedding, n_results, results)
+        return results
+
+    def embed_query(self, query: str) -> np.ndarray:
+        """Embed a search query.
+
+        Embeddings of recent queries are cached by their cleaned text.
+
+        Args:
+            query: Search query.
+
+        Returns:
+            Unit-length query embedding as a float32 vector.
+        """
+        key = self._clean_text(query)
+        with self._cache_lock:
+            embedding = self._embedding_cache.get(key)
+            if embedding is not None:
+                self._embedding_cache.move_to_end(key)
+                return embedding
+
+        # The cache key is the cleaned query, so it is not cleaned again
+        embedding = _normalize(self._get_embeddings_batch([key], cleaned=True)[0])
+        if QUERY_CACHE_SIZE > 0:
+            with self._cache_lock:
+                self._embedding_cache[key] = embedding
+                self._embedding_cache.move_to_end(key)
+                if len(self._embedding_cache) > QUERY_CACHE_SIZE:
+                    self._embedding_cache.popitem(last=False)
+        return embedding
+
+    def _lookup_results(
+        self,
+        query_embedding: np.ndarray,
+        n_results: int
+    ) -> Optional[SearchResults]:
+        """Find cached results of a query similar to the given one.
+
+        Args:
+            query_embedding: Unit-length embedding of the query.
+            n_results: Number of results asked for.
+
+        Returns:
+            Cached search results, or None if no cached query is close enough.
+        """
+        with self._cache_lock:
+            # Stored documents changed since the results were cached
+            if self._results_generation != self.generation:
+                self._results_cache.clear()
+                self._results_generation = self.generation
+
+            if not self._results_cache or self._results_vectors.shape[1] != query_embedding.shape[0]:
+                return None
+
+            n = len(self._results_cache)
+            if simsimd is not None:
+                # Cosine ignores the per-row scales, so SimSIMD's int8
+                # kernel compares the rows with the query quantized alike
+                quantized, _ = _quantize(query_embedding)
+                distances = simsimd.cdist(
+                    quantized[np.newaxis], self._results_vectors[:n], metric="cosine"
+                )
+                similarities = 1.0 - np.asarray(distances, dtype=np.float32)[0]
+            else:
+                # Query embeddings are unit length, so a dot product is the cosine
+                similarities = (self._results_vectors[:n] @ query_embedding) * self._results_scales[:n]
+            best = int(np.argmax(similarities))
+            if similarities[best] < QUERY_CACHE_THRESHOLD:
+                return None
+
+            key = self._results_row_keys[best]
+            _, cached_n_results, results = self._results_cache[key]
+            if cached_n_results != n_results:
+                return None
+            self._results_cache.move_to_end(key)
+            return results
+
+    def _cache_results(
+        self,
+        query: str,
+        query_embedding: np.ndarray,
+        n_results: int,
+        results: SearchResults
+    ) -> None:
+        """Store a query's search results, evicting the least recent entry.
 
+        Must be called with the cache lock held.
+
+        Args:
+            query: Search query.
+            query_embedding: Unit-length embedding of the query.
+            n_results: Number of results asked for.
+            results: Results found for the query.
+        """
+        dim = query_embedding.shape[0]
+        if self._results_vectors is None or self._results_vectors.shape[1] != dim:
+            # First entry, or the embedding model changed: start over
+            self._results_vectors = np.empty((QUERY_CACHE_SIZE, dim), dtype=np.int8)
+            self._results_scales = np.empty(QUERY_CACHE_SIZE, dtype=np.float32)
+            self._results_cache.clear()
+
+        if query in self._results_cache:
+            row = self._results_cache[query][0]
+        elif len(self._results_cache) < QUERY_CACHE_SIZE:
+            row = len(self._results_cache)
+        else:
+            # Reuse the row of the least recently used entry, which keeps
+            # the occupied rows contiguous
+            _, (row, _, _) = self._results_cache.popitem(last=False)
+
+        self._results_vectors[row], self._results_scales[row] = _quantize(query_embedding)
+        self._results_row_keys[row] = query
+        self._results_cache[query] = (row, n_results, results)
+        self._results_cache.move_to_end(query)
+
+    def search_by_vector(
+        self,
+        query_embedding: np.ndarray,
+        n_results: int = MAX_CONTEXT_CHUNKS
+    ) -> "SearchResults":
+        """Search for document chunks similar to an embedded query.
+
+        Args:
+            query_embedding: Embedding of the search query.
+            n_results: Number of results to return.
+
+        Returns:
+            Similar chunks with metadata and scores, best match first.
+        """
+        try:
             # Search collection
             results = self.collection.query(
-                query_embeddings=[query_embedding],
+                query_embeddings=[query_embedding.tolist()],
                 n_results=n_results,
                 include=["documents", "metadatas", "distances"]
             )
 
-            # Format results
-            similar_chunks = []
-            if results["documents"] and results["documents"][0]:
-                for i, doc in enumerate(results["documents"][0]):
-                    metadata = results["metadatas"][0][i]
-                    distance = results["distances"][0][i]
-                    
-                    # Convert distance to similarity score (lower distance = higher similarity)
-                    similarity_score = 1.0 - distance
-                    
-                    similar_chunks.append({
-                        "text": doc,
-                        "filename": metadata["filename"],
-                        "page_number": metadata["page_number"],
-                        "filepath": metadata["filepath"],
-                        "tokens": metadata.get("tokens", 0),
-                        "similarity_score": similarity_score
-                    })
+            if not (results["documents"] and results["documents"][0]):
+                logger.info("Found 0 similar chunks for query")
+                return SearchResults.empty()
+
+            # Split the metadata into columns in a single pass
+            filenames, filepaths, page_numbers, tokens = zip(*[
+                (
+                    metadata["filename"],
+                    metadata["filepath"],
+                    metadata["page_number"],
+                    metadata.get("tokens", 0)
+                )
+                for metadata in results["metadatas"][0]
+            ])
+            # Convert distance to similarity score (lower distance = higher similarity);
+            # stored and query vectors are unit length in an "ip"
+            # collection, so this is the cosine similarity
+            similar = SearchResults(
+                texts=results["documents"][0],
+                filenames=list(filenames),
+                filepaths=list(filepaths),
+                page_numbers=np.array(page_numbers, dtype=np.int64),
+                tokens=np.array(tokens, dtype=np.int64),
+                scores=1.0 - np.asarray(results["distances"][0], dtype=np.float32)
+            )
 
-            logger.info(f"Found {len(similar_chunks)} similar chunks for query")
-            return similar_chunks
+            logger.info(f"Found {len(similar)} similar chunks for query")
+            return similar
 
         except Exception as e:
             logger.error(f"Failed to search vector store: {e}")
-            return []
+            return SearchResults.empty()
 
     def get_collection_stats(self) -> Dict[str, int]:
         """Get statistics about the collection.
@@ -256,11 +996,13 @@ class VectorStore:
     def clear_collection(self) -> None:
         """Clear all documents from the collection."""
         try:
+            # Drop migration leftovers too, so clearing can never bring
+            # back documents from an interrupted migration
             self.client.delete_collection(self.collection_name)
-            self.collection = self.client.create_collection(
-                name=self.collection_name,
-                metadata={"description": "PDF document chunks"}
-            )
+            self._delete_collection_if_exists(self.collection_name + _MIGRATION_SUFFIX)
+            self._delete_collection_if_exists(self.collection_name + _MIGRATED_SUFFIX)
+            self.collection = self._open_collection()
+            self.generation += 1
             logger.info(f"Cleared collection: {self.collection_name}")
         except Exception as e:
             logger.error(f"Failed to clear collection: {e}")
@@ -309,18 +1051,15 @@ class VectorStore:
             Number of chunks deleted.
         """
         try:
-            # Get all IDs for the filename
-            results = self.collection.get(
-                where={"filename": filename},
-                include=["metadatas"]
-            )
+            # Let Chroma match the chunks itself instead of fetching their
+            # IDs first; the count difference gives the number deleted
+            before = self.collection.count()
+            self.collection.delete(where={"filename": filename})
+            deleted_count = before - self.collection.count()
 
-            if not results["ids"]:
+            if not deleted_count:
                 return 0
-
-            # Delete the chunks
-            self.collection.delete(ids=results["ids"])
-            deleted_count = len(results["ids"])
+            self.generation += 1
             
             logger.info(f"Deleted {deleted_count} chunks for file: {filename}")
             return deleted_count
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Test script for concurrent chat queries and their history."""
+
+import asyncio
+
+import numpy as np
+from test_history_manager import temporary_history_paths
+
+from chat_engine import ChatEngine
+from history_manager import HistoryManager
+from vector_store import SearchResults
+
+
+class FakeVectorStore:
+    """Returns one fixed hit for every query, without Ollama or Chroma."""
+
+    def search_similar(self, query, n_results=5):
+        return SearchResults(
+            texts=[f"Context for {query}"],
+            filenames=["test.pdf"],
+            filepaths=["/test.pdf"],
+            page_numbers=np.array([1]),
+            tokens=np.array([4]),
+            scores=np.array([0.9], dtype=np.float32),
+        )
+
+
+async def fake_chat(model, messages, stream=False):
+    """Answer later questions sooner, so replies complete out of order."""
+    prompt = messages[-1]["content"]
+    number = int(prompt.rsplit("Question ", 1)[1].split("?", 1)[0])
+    await asyncio.sleep(0.05 * (4 - number))
+    return {"message": {"content": f"Answer {number}"}}
+
+
+def test_concurrent_queries_keep_question_answer_pairs():
+    """Concurrent answers are recorded right after their own question."""
+    with temporary_history_paths():
+        history = HistoryManager()
+        engine = ChatEngine(FakeVectorStore(), history)
+        engine._async_client.chat = fake_chat
+        first = history.create_session("first")
+        second = engine.start_session("second")
+
+        async def run():
+            return await asyncio.gather(
+                engine.achat_many([f"Question {i}?" for i in range(1, 4)], first),
+                engine.achat("Question 1?"),
+            )
+
+        replies, single = asyncio.run(run())
+        engine.close()
+        assert not engine._history_writer.is_alive()
+
+        assert [r["response"] for r in replies] == ["Answer 1", "Answer 2", "Answer 3"]
+        assert {r["session_id"] for r in replies} == {first}
+        assert single["session_id"] == second
+
+        messages = history.get_session(first)["messages"]
+        assert len(messages) == 6
+        for question, answer in zip(messages[::2], messages[1::2]):
+            assert question["role"] == "user" and answer["role"] == "assistant"
+            assert answer["content"] == question["content"].replace("Question", "Answer").rstrip("?")
+        assert len(history.get_session(second)["messages"]) == 2
+        print("Concurrent answers stay paired with their questions")
+
+
+if __name__ == "__main__":
+    test_concurrent_queries_keep_question_answer_pairs()
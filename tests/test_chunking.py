@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Test script for sentence-based chunking and chunk overlap."""
+
+import re
+from unittest import mock
+
+import tiktoken
+
+import pdf_processor
+from pdf_processor import PDFProcessor
+
+METADATA = {"page_number": 1, "filename": "test.pdf", "filepath": "/test.pdf"}
+
+
+def byte_level_encoding() -> "tiktoken.Encoding":
+    """Build a small offline BPE whose tokens often split words and characters."""
+    ranks = {bytes([i]): i for i in range(256)}
+    for merge in [b" S", b"en", b"er", b"ung", b" n", b"\xc3\xa4", b"\xc3\xbc"]:
+        ranks[merge] = len(ranks)
+    return tiktoken.Encoding(
+        "test_bytes",
+        pat_str=r"""'s|'t|'re|'ve|'m|'ll|'d| ?\p{L}+| ?\p{N}+| ?[^\s\p{L}\p{N}]+|\s+(?!\S)|\s+""",
+        mergeable_ranks=ranks,
+        special_tokens={},
+    )
+
+
+def make_processor(tokenizer) -> PDFProcessor:
+    """Create an uncached processor using the given tokenizer."""
+    with mock.patch.object(pdf_processor, "_get_enc", return_value=tokenizer):
+        processor = PDFProcessor(cache_dir=None)
+    processor.tokenizer = tokenizer
+    return processor
+
+
+def assert_chunks_preserve_source(chunks, sentences):
+    """Every chunk must be a contiguous, correctly spaced piece of the text."""
+    joined = " ".join(sentences)
+    assert len(chunks) > 2, "text should need several chunks"
+    for chunk in chunks:
+        assert chunk.text in joined, f"chunk is not a join of source sentences: {chunk.text!r}"
+        # Overlap starts on a word, never on a fragment of one
+        start = joined.index(chunk.text)
+        assert start == 0 or joined[start - 1] == " ", f"chunk starts mid-word: {chunk.text!r}"
+    for sentence in sentences:
+        assert any(sentence in chunk.text for chunk in chunks), f"sentence lost: {sentence!r}"
+
+
+def test_overlap_keeps_sentence_separators():
+    """Overlapped chunks keep the spaces between sentences."""
+    sentences = [f"Sentence number {i} ends here." for i in range(60)]
+    processor = make_processor(byte_level_encoding())
+    chunks = processor.chunk_text(" ".join(sentences), METADATA, chunk_size=120, overlap=40)
+    assert_chunks_preserve_source(chunks, sentences)
+    assert not any(re.search(r"\.\S", chunk.text) for chunk in chunks)
+    print(f"{len(chunks)} chunks keep their sentence separators")
+
+
+def test_overlap_with_multibyte_text():
+    """Overlap never starts inside a multibyte character or a word."""
+    sentences = [f"Die Änderung {i} für große Übersetzungen ist geprüft." for i in range(40)]
+    processor = make_processor(byte_level_encoding())
+    for overlap in (13, 40, 44, 46):
+        chunks = processor.chunk_text(" ".join(sentences), METADATA, chunk_size=150, overlap=overlap)
+        assert_chunks_preserve_source(chunks, sentences)
+        assert not any("�" in chunk.text for chunk in chunks)
+    print("Multibyte overlap stays on character and word boundaries")
+
+
+def test_word_count_fallback():
+    """Without a tokenizer, chunks are still clean joins of the sentences."""
+    sentences = [f"Sentence number {i} ends here." for i in range(200)]
+    processor = make_processor(None)
+    chunks = processor.chunk_text(" ".join(sentences), METADATA, chunk_size=100, overlap=20)
+    assert_chunks_preserve_source(chunks, sentences)
+    print(f"{len(chunks)} chunks from the word-count fallback")
+
+
+if __name__ == "__main__":
+    test_overlap_keeps_sentence_separators()
+    test_overlap_with_multibyte_text()
+    test_word_count_fallback()
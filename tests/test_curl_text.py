@@ -25,7 +25,8 @@ def test_curl_text():
         
         print(f"Testing with text: {text[:100]}...")
         
-        response = requests.post(url, json=payload, timeout=60)
+        with requests.Session() as session:
+            response = session.post(url, json=payload, timeout=60)
         print(f"Response status: {response.status_code}")
         
         if response.status_code == 200:
@@ -2,6 +2,9 @@
 """Test script to debug embedding issues."""
 
 import logging
+
+import numpy as np
+from pdf_processor import Chunk
 from vector_store import VectorStore
 
 # Configure logging
@@ -20,15 +23,26 @@ def test_embedding():
         embedding = vs._get_embedding("This is a test document.")
         print(f"Success! Generated embedding with {len(embedding)} dimensions")
         
+        print("Testing query embedding normalization...")
+        magnitude = float(np.linalg.norm(vs.embed_query("This is a test document.")))
+        print(f"Query embedding magnitude: {magnitude:.6f} (expected ~1.0)")
+        
+        print("Testing batch embedding...")
+        embeddings = vs._get_embeddings_batch([
+            "This is the first test document.",
+            "This is the second test document."
+        ])
+        print(f"Success! Generated {len(embeddings)} embeddings in one request")
+        
         print("Testing document addition...")
         test_chunks = [
-            {
-                "text": "This is a test document chunk.",
-                "filename": "test.pdf",
-                "page_number": 1,
-                "filepath": "/tmp/test.pdf",
-                "tokens": 10
-            }
+            Chunk(
+                text="This is a test document chunk.",
+                tokens=10,
+                page_number=1,
+                filename="test.pdf",
+                filepath="/tmp/test.pdf"
+            )
         ]
         
         vs.add_documents(test_chunks)
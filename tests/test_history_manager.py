@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Test script for chat history storage and migration."""
+
+import gc
+import json
+import os
+import tempfile
+import weakref
+from contextlib import contextmanager
+from pathlib import Path
+from unittest import mock
+
+import history_manager
+from history_manager import HistoryManager
+
+
+@contextmanager
+def temporary_history_paths():
+    """Point the history manager at a fresh temporary data directory."""
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp)
+        sessions_dir = data_dir / "sessions"
+        with mock.patch.multiple(
+            history_manager,
+            HISTORY_DB_PATH=data_dir / "chat_history.json",
+            SESSIONS_DIR=sessions_dir,
+            HISTORY_INDEX_PATH=sessions_dir / "index.json",
+            ensure_data_dir=lambda: data_dir,
+        ):
+            yield data_dir
+
+
+def test_legacy_history_migration():
+    """A single-file chat_history.json is split into an index and logs."""
+    with temporary_history_paths() as data_dir:
+        legacy_sessions = [
+            {
+                "id": "20240101_120000",
+                "name": "First",
+                "created_at": "2024-01-01T12:00:00",
+                "messages": [
+                    {"role": "user", "content": "Hello", "timestamp": "t1"},
+                    {"role": "assistant", "content": "Hi", "timestamp": "t2"},
+                ],
+            },
+            {
+                "id": "20240102_120000_notes/draft",
+                "name": "notes/draft",
+                "created_at": "2024-01-02T12:00:00",
+                "messages": [],
+            },
+        ]
+        legacy_file = data_dir / "chat_history.json"
+        legacy_file.write_text(json.dumps({"sessions": legacy_sessions}))
+
+        manager = HistoryManager()
+
+        assert not legacy_file.exists()
+        assert (data_dir / "chat_history.json.bak").exists()
+        assert (data_dir / "sessions" / "index.json").exists()
+
+        first = manager.get_session("20240101_120000")
+        assert [m["content"] for m in first["messages"]] == ["Hello", "Hi"]
+        assert manager.get_session_summary("20240101_120000")["total_messages"] == 2
+        assert manager.get_session("20240102_120000_notes/draft")["messages"] == []
+
+        # A second start must not migrate again or lose anything
+        manager.flush()
+        reloaded = HistoryManager()
+        assert len(reloaded.get_all_sessions()) == 2
+        assert len(reloaded.get_session("20240101_120000")["messages"]) == 2
+        print("Legacy history migration works")
+
+
+def test_session_logs_stay_in_sessions_dir():
+    """Session IDs never escape the sessions directory."""
+    with temporary_history_paths() as data_dir:
+        sessions_dir = data_dir / "sessions"
+        manager = HistoryManager()
+
+        session_id = manager.create_session("a/b")
+        manager.add_message(session_id, "user", "Hello")
+        assert manager.get_session(session_id)["messages"][0]["content"] == "Hello"
+
+        export_file = data_dir / "export.json"
+        export_file.write_text(json.dumps({
+            "id": "../../escaped",
+            "name": "Imported",
+            "created_at": "2024-01-01T12:00:00",
+            "messages": [{"role": "user", "content": "Hi", "timestamp": "t"}],
+        }))
+        imported_id = manager.import_session(export_file)
+        assert imported_id == "../../escaped"
+        assert len(manager.get_session(imported_id)["messages"]) == 1
+
+        assert not (data_dir.parent / "escaped.jsonl").exists()
+        for log in data_dir.rglob("*.jsonl"):
+            assert log.parent == sessions_dir
+        print("Session logs stay in the sessions directory")
+
+
+def test_dropped_manager_is_collected():
+    """Registering for the exit flush does not keep a manager alive."""
+    with temporary_history_paths():
+        manager = HistoryManager()
+        session_id = manager.create_session("Dropped")
+        manager.add_message(session_id, "user", "Hello")
+        ref = weakref.ref(manager)
+        del manager
+        gc.collect()
+        assert ref() is None
+
+        reloaded = HistoryManager()
+        assert len(reloaded.get_session(session_id)["messages"]) == 1
+        print("Dropped history managers are collected")
+
+
+def test_stale_message_count_is_recounted():
+    """A log appended after the last index write is recounted on load."""
+    with temporary_history_paths():
+        manager = HistoryManager()
+        session_id = manager.create_session("Crashed")
+        manager.add_message(session_id, "user", "Hello")
+
+        # Simulate a crash after the log append but before the index flush
+        log_file = manager._session_file(session_id)
+        with open(log_file, "ab") as f:
+            f.write(b'{"role": "assistant", "content": "Hi", "timestamp": "t"}\n')
+        index_mtime = manager.history_file.stat().st_mtime_ns
+        os.utime(log_file, ns=(index_mtime + 10**9, index_mtime + 10**9))
+
+        reloaded = HistoryManager()
+        assert reloaded.get_all_sessions()[0]["message_count"] == 2
+
+        session = reloaded.get_session(session_id)
+        session["messages"].append({"role": "user", "content": "Not saved"})
+        assert len(reloaded.get_session(session_id)["messages"]) == 2
+        print("Stale message counts are recounted")
+
+
+if __name__ == "__main__":
+    test_legacy_history_migration()
+    test_session_logs_stay_in_sessions_dir()
+    test_dropped_manager_is_collected()
+    test_stale_message_count_is_recounted()
@@ -31,10 +31,10 @@ def test_pdf_processing():
         
         if chunks:
             print("First chunk preview:")
-            print(f"Text: {chunks[0]['text'][:200]}...")
-            print(f"Tokens: {chunks[0].get('tokens', 'N/A')}")
-            print(f"Filename: {chunks[0]['filename']}")
-            print(f"Page: {chunks[0]['page_number']}")
+            print(f"Text: {chunks[0].text[:200]}...")
+            print(f"Tokens: {chunks[0].tokens}")
+            print(f"Filename: {chunks[0].filename}")
+            print(f"Page: {chunks[0].page_number}")
         
         # Test vector store addition
         print("\nTesting vector store addition...")
@@ -26,12 +26,14 @@ def test_progressive_text():
             print("No chunks found!")
             return
             
-        first_chunk_text = chunks[0]["text"]
+        first_chunk_text = chunks[0].text
         print(f"Original text length: {len(first_chunk_text)} characters")
         
         # Test with progressively longer portions
         test_lengths = [100, 500, 1000, 2000, 3000, len(first_chunk_text)]
         
+        # One session for all requests so the connection is reused
+        session = requests.Session()
         for length in test_lengths:
             test_text = first_chunk_text[:length]
             print(f"\nTesting with {len(test_text)} characters...")
@@ -43,7 +45,7 @@ def test_progressive_text():
             }
             
             try:
-                response = requests.post(url, json=payload, timeout=60)
+                response = session.post(url, json=payload, timeout=60)
                 if response.status_code == 200:
                     data = response.json()
                     print(f"✅ Success! Generated embedding with {len(data['embedding'])} dimensions")
@@ -22,7 +22,7 @@ def test_specific_text():
         chunks = processor.process_pdf(pdf_path)
         
         if chunks:
-            first_chunk_text = chunks[0]["text"]
+            first_chunk_text = chunks[0].text
             print(f"Testing with first chunk text:")
             print(f"Length: {len(first_chunk_text)} characters")
             print(f"First 200 chars: {first_chunk_text[:200]}")